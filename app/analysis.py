@@ -0,0 +1,61 @@
+import numpy as np
+from scipy import stats
+
+
+class ObjectiveAnalysis:
+    # Objective matrix of a set of individuals, built once, with the
+    # statistics the reports derive from it cached on first use. Columns
+    # follow Individual.objectives order.
+    def __init__(self, individuals):
+        self.individuals = list(individuals)
+        self.keys = list(
+            self.individuals[0].objectives) if len(self.individuals) > 0 else []
+        self.matrix = np.array([[i.objectives[key] for key in self.keys] for i in self.individuals],
+                               dtype=float).reshape(-1, len(self.keys))
+        self.fitnessValues = None
+        self.correlation = None
+
+    def __len__(self):
+        return len(self.individuals)
+
+    def column(self, key):
+        return self.matrix[:, self.keys.index(key)]
+
+    def __scaled(self, key):
+        values = self.column(key)
+        scale = values.max() - values.min()
+        if scale == 0:
+            scale = 1
+        return (values - values.min()) / scale
+
+    def fitness(self):
+        # Min-max normalized sum over the objectives: a lower center of mass,
+        # a higher weight and a higher volume are better
+        if self.fitnessValues is None:
+            self.fitnessValues = 1 - self.__scaled('center_of_mass')
+            self.fitnessValues += self.__scaled('weight')
+            self.fitnessValues += self.__scaled('volume')
+        return self.fitnessValues
+
+    def best(self, key, reverse=True):
+        # Index of the first individual with the highest (lowest unless
+        # reverse) fitness or objective
+        values = self.fitness() if key == 'fitness' else self.column(key)
+        return int(np.argmax(values) if reverse else np.argmin(values))
+
+    def rankCorrelation(self):
+        # Spearman correlation and p-value matrices of all objective pairs
+        # from one call. spearmanr collapses to one pair when there are two
+        # columns or a constant one, then every pair is ranked on its own.
+        if self.correlation is None:
+            count = len(self.keys)
+            correlation, pvalue = stats.spearmanr(self.matrix)
+            if np.shape(correlation) != (count, count):
+                pairs = [[stats.spearmanr(self.matrix[:, i], self.matrix[:, j]) for j in range(count)]
+                         for i in range(count)]
+                correlation = [[pair.correlation for pair in row]
+                               for row in pairs]
+                pvalue = [[pair.pvalue for pair in row] for row in pairs]
+            self.correlation = (np.asarray(correlation, dtype=float).reshape(count, count),
+                                np.asarray(pvalue, dtype=float).reshape(count, count))
+        return self.correlation
@@ -1,14 +1,25 @@
-from tester import Tester
-from ga import GeneticAlgorithm
+from dotenv import load_dotenv
+load_dotenv()
+from jobs import JobManager, JobRejected
+from results import ResultStore
 from flask import Flask, send_from_directory, request
 from flask_socketio import SocketIO, emit, join_room, leave_room
 import os
-import data_gen
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 socketio = SocketIO(app, message_queue=os.getenv(
     'REDIS_URL'), cors_allowed_origins=os.getenv('CLIENT_ORIGIN'))
+jobManager = JobManager(workers=int(os.getenv('GA_WORKERS', 1)), maxQueued=int(os.getenv('GA_MAX_QUEUED', 16)),
+                        local=os.getenv('GA_LOCAL_JOBS') == '1', socket=socketio,
+                        reportWorkers=int(os.getenv('GA_REPORT_WORKERS', 2)),
+                        maxQueuedJobs=int(os.getenv('GA_MAX_QUEUED_JOBS', 2048)))
+resultStore = ResultStore()
+
+
+@app.route('/metrics')
+def metrics():
+    return jobManager.metrics.toPrometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
 
 
 @app.route('/static/<path:path>')
@@ -27,53 +38,80 @@ def connect():
 @socketio.on('disconnect')
 def disconnect():
     leave_room(request.sid)
+    jobManager.cancelOwnedBy(request.sid)
     print('Client {} disconnected'.format(request.sid))
 
 
 @socketio.on('data-in')
 def data_in(data):
     id = data['id'] if 'id' in data else request.sid
-    boxes = data['boxes']
-    grid_x = data['grid_x']
-    grid_y = data['grid_y']
-    grid_z = data['grid_z']
-    mutation_probability = data['mutation_probability']
-    max_generation = data['max_generation']
-    population_size = data['population_size']
-
-    population = data_gen.loadData(
-        boxes, grid_x, grid_y, grid_z, population_size)
-
-    GA = GeneticAlgorithm(population, mutation_probability,
-                          max_generation, room_id=id)
-
-    emit("status", {"status": "ga-begin"}, room=id)
-    GA.start()
-    emit("status", {"status": "ga-end"}, room=id)
-
-    Test = Tester(GA, show=False, save=True, savePath='static', room_id=id)
-
-    emit("status", {"status": "generate-best-fitness-begin"}, room=id)
-    path = Test.getBestIndividual("fitness")
-    emit("status", {"status": "generate-best-fitness-end",
-                    "graph": path}, room=id)
-
-    emit("status", {"status": "generate-best-center_of_mass-begin"}, room=id)
-    path = Test.getBestIndividual("center_of_mass")
-    emit("status", {"status": "generate-best-center_of_mass-end",
-                    "graph": path}, room=id)
-
-    emit("status", {"status": "generate-best-volume-begin"}, room=id)
-    path = Test.getBestIndividual("volume")
-    emit("status", {"status": "generate-best-volume-end",
-                    "graph": path}, room=id)
-
-    emit("status", {"status": "generate-best-weight-begin"}, room=id)
-    path = Test.getBestIndividual("weight")
-    emit("status", {"status": "generate-best-weight-end",
-                    "graph": path}, room=id)
-
-    emit("status", {"status": "done"}, room=id)
+
+    # The GA runs in a job worker, this handler only queues it
+    try:
+        job_id = jobManager.submit(data, id, owner=request.sid)
+    except JobRejected as e:
+        emit("status", {"status": "rejected", "error": str(e)}, room=id)
+        return {"status": "rejected"}
+
+    emit("status", {"status": "queued", "job_id": job_id}, room=id)
+    return {"status": "queued", "job_id": job_id}
+
+
+@socketio.on('batch-in')
+def batch_in(data):
+    id = data['id'] if 'id' in data else request.sid
+
+    # Many (boxes, grid) problems with shared GA settings, every problem runs
+    # as its own job and reports under the batch id. Passing back the seed
+    # of a batch reproduces it.
+    try:
+        batch_id, job_ids, seed = jobManager.submitBatch(data['problems'], data['settings'], id, owner=request.sid,
+                                                         seed=int(data['seed']) if 'seed' in data else None)
+    except JobRejected as e:
+        emit("status", {"status": "rejected", "error": str(e)}, room=id)
+        return {"status": "rejected"}
+
+    emit("status", {"status": "queued", "batch_id": batch_id,
+                    "job_ids": job_ids, "seed": str(seed)}, room=id)
+    return {"status": "queued", "batch_id": batch_id, "job_ids": job_ids, "seed": str(seed)}
+
+
+@socketio.on('resume')
+def resume(data):
+    id = data['id'] if 'id' in data else request.sid
+
+    # Continue from the last checkpoint, max_generation may extend the run
+    try:
+        job_id = jobManager.resume(data['job_id'], data, id, owner=request.sid)
+    except JobRejected as e:
+        emit("status", {"status": "rejected", "error": str(e)}, room=id)
+        return {"status": "rejected"}
+
+    emit("status", {"status": "queued", "job_id": job_id}, room=id)
+    return {"status": "queued", "job_id": job_id}
+
+
+@socketio.on('render')
+def render(data):
+    # Figure of a best individual, rendered on first request only
+    graph = resultStore.figure(data['job_id'], data['individual'],
+                               batched=data['batched'] if 'batched' in data else None)
+    if graph is None:
+        return {"status": "not-found"}
+    return {"status": "ok", "job_id": data['job_id'], "individual": data['individual'], "graph": graph}
+
+
+@socketio.on('cancel')
+def cancel(data):
+    id = data['id'] if 'id' in data else request.sid
+    if 'batch_id' in data:
+        for job_id in jobManager.cancelBatch(data['batch_id']):
+            emit("status", {"status": "cancelling", "job_id": job_id,
+                            "batch_id": data['batch_id']}, room=id)
+        return
+    if jobManager.cancel(data['job_id']):
+        emit("status", {"status": "cancelling",
+                        "job_id": data['job_id']}, room=id)
 
 
 if __name__ == '__main__':
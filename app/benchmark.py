@@ -0,0 +1,154 @@
+import argparse
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+from tabulate import tabulate
+import data_gen
+from ga import GeneticAlgorithm
+from progress import NullEmitter
+
+# Usage:
+#   python benchmark.py --output before.json
+#   python benchmark.py --output after.json --compare before.json
+
+
+def generateBoxes(boxCount, seed):
+    # Seeded synthetic load, same box set for the same (boxCount, seed)
+    rng = random.Random(seed)
+    return [[code, rng.randint(5, 25), rng.randint(5, 25), rng.randint(5, 25), rng.randint(1, 50)]
+            for code in range(1, boxCount + 1)]
+
+
+def gridFor(boxes, fill=0.8):
+    # Cubic container holding roughly `fill` of the total box volume
+    volume = sum(length * width * height for _, length,
+                 width, height, _ in boxes)
+    side = math.ceil((volume * fill) ** (1 / 3))
+    return side, side, side
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def runCase(boxCount, populationSize, generations, seed):
+    boxes = generateBoxes(boxCount, seed)
+    gridX, gridY, gridZ = gridFor(boxes)
+    result = {'boxes': boxCount, 'population': populationSize,
+              'generations': generations, 'grid': [gridX, gridY, gridZ]}
+
+    # Decoding: loadData decodes every individual of the initial population
+    random.seed(seed)
+    elapsed, population = timed(
+        data_gen.loadData, boxes, gridX, gridY, gridZ, populationSize)
+    result['decode_per_individual'] = elapsed / populationSize
+
+    GA = GeneticAlgorithm(population, 0.1, generations,
+                          room_id=None, socket=NullEmitter())
+
+    # Single stages on the initial population and a merged 2N population
+    result['sort_n'], _ = timed(GA.fastNonDominatedSort, population)
+    result['crowding_n'], _ = timed(
+        lambda: [GA.calculateCrowdingDistance(front) for front in population.fronts])
+    result['create_children'], children = timed(GA.createChildren, population)
+    population.extend(children)
+    result['sort_2n'], _ = timed(GA.fastNonDominatedSort, population)
+    result['crowding_2n'], _ = timed(
+        lambda: [GA.calculateCrowdingDistance(front) for front in population.fronts])
+
+    # Full generations from a fresh population with the same seed
+    random.seed(seed)
+    population = data_gen.loadData(
+        boxes, gridX, gridY, gridZ, populationSize)
+    GA = GeneticAlgorithm(population, 0.1, generations,
+                          room_id=None, socket=NullEmitter())
+    result['run'], _ = timed(GA.start)
+    result['generations_per_second'] = generations / \
+        result['run'] if result['run'] > 0 else None
+
+    # Peak memory of a one generation run, traced separately since
+    # tracemalloc slows everything down
+    random.seed(seed)
+    tracemalloc.start()
+    population = data_gen.loadData(
+        boxes, gridX, gridY, gridZ, populationSize)
+    GeneticAlgorithm(population, 0.1, 1, room_id=None,
+                     socket=NullEmitter()).start()
+    result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result
+
+
+def gitCommit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+STAGES = ['decode_per_individual', 'sort_n', 'crowding_n', 'create_children',
+          'sort_2n', 'crowding_2n', 'run', 'generations_per_second', 'peak_memory_bytes']
+
+
+def compare(current, baseline):
+    # Ratio current / baseline per stage, < 1 is faster (higher is better
+    # only for generations_per_second)
+    previous = {(case['boxes'], case['population']): case for case in baseline['cases']}
+    rows = []
+    for case in current['cases']:
+        old = previous.get((case['boxes'], case['population']))
+        if old is None:
+            continue
+        rows.append([case['boxes'], case['population']] +
+                    [round(case[stage] / old[stage], 3) if old.get(stage) else None for stage in STAGES])
+    return tabulate(rows, headers=['boxes', 'population'] + STAGES)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark decoding, sorting, crowding and GA throughput')
+    parser.add_argument('--boxes', type=int, nargs='+',
+                        default=[50, 200, 1000])
+    parser.add_argument('--populations', type=int,
+                        nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--generations', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', default=None,
+                        help='previous results file to compare against')
+    args = parser.parse_args()
+
+    results = {
+        'commit': gitCommit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'seed': args.seed,
+        'cases': []
+    }
+    for boxCount in args.boxes:
+        for populationSize in args.populations:
+            case = runCase(boxCount, populationSize,
+                           args.generations, args.seed)
+            results['cases'].append(case)
+            print(tabulate([[stage, case[stage]] for stage in STAGES],
+                           headers=['{} boxes, population {}'.format(boxCount, populationSize), 'value']))
+            print()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            print(compare(results, json.load(f)))
+
+
+if __name__ == '__main__':
+    main()
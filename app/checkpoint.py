@@ -0,0 +1,49 @@
+import os
+import json
+import numpy as np
+from results import isIdentifier, atomicWrite
+
+
+def checkpointPath(jobId):
+    if not isIdentifier(jobId):
+        raise ValueError("Invalid job id {!r}".format(jobId))
+    return os.path.join(os.getenv('GA_CHECKPOINT_DIR', 'checkpoints'), '{}.npz'.format(jobId))
+
+
+def packGenomes(genomes):
+    # (individuals, genes) matrices of codes and orientations
+    geneCount = len(genomes[0]) if len(genomes) > 0 else 0
+    codes = np.array([genome.codes for genome in genomes],
+                     dtype=np.int32).reshape(-1, geneCount)
+    orientations = np.array([genome.orientations for genome in genomes],
+                            dtype=np.uint8).reshape(-1, geneCount)
+    return codes, orientations
+
+
+def packRandomState(rng, npRandom):
+    version, internal, gauss = rng.getstate()
+    return {
+        'random_version': np.array(version),
+        'random_internal': np.array(internal, dtype=np.int64),
+        'random_gauss': np.array(np.nan if gauss is None else gauss),
+        'np_random': np.array(json.dumps(npRandom.bit_generator.state))
+    }
+
+
+def restoreRandomState(checkpoint, rng, npRandom):
+    gauss = float(checkpoint['random_gauss'])
+    rng.setstate((int(checkpoint['random_version']), tuple(checkpoint['random_internal'].tolist()),
+                     None if np.isnan(gauss) else gauss))
+    npRandom.bit_generator.state = json.loads(str(checkpoint['np_random']))
+
+
+def writeCheckpoint(path, **arrays):
+    # A crash leaves either the previous checkpoint or the new one, never a
+    # partial file
+    with atomicWrite(path) as f:
+        np.savez_compressed(f, **arrays)
+
+
+def readCheckpoint(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
@@ -0,0 +1,111 @@
+import math
+import time
+import numpy as np
+from sortedcontainers import SortedList
+
+
+def normalizedObjectives(individuals, boxTable, gridX, gridY, gridZ):
+    # Front objectives scaled to [0, 1] in minimization form: unused volume
+    # share, weight share and center of mass distance over the half diagonal
+    # of the container, so (1, 1, 1) bounds every solution
+    length, width, height, weight = boxTable.dimensions[boxTable.codes].T
+    totalVolume = max(1, int(np.sum(length * width * height)))
+    totalWeight = max(1, int(np.sum(weight)))
+    halfDiagonal = max(1, math.sqrt(gridX**2 + gridY**2 + gridZ**2) / 2)
+    return np.array([[1 - i.objectives['volume'] / totalVolume, i.objectives['weight'] / totalWeight,
+                      i.objectives['center_of_mass'] / halfDiagonal] for i in individuals], dtype=float).reshape(-1, 3)
+
+
+def hypervolume(points, reference=(1.0, 1.0, 1.0)):
+    # Volume dominated by `points` (minimization) up to `reference`, swept
+    # along the last objective while keeping the 2D staircase of the first
+    # two and its area up to date, O(n log n)
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    points = points[np.all(points < np.asarray(reference), axis=1)]
+    if len(points) == 0:
+        return 0.0
+    points = points[np.argsort(points[:, 2], kind='stable')]
+    refX, refY, refZ = reference
+
+    staircase = SortedList()
+    area = 0.0
+    volume = 0.0
+    for k, (x, y, z) in enumerate(points.tolist()):
+        # Dominated in the first two objectives by a point already swept
+        right = staircase.bisect_right((x, math.inf))
+        if right > 0 and staircase[right - 1][1] <= y:
+            volume += area * ((points[k + 1, 2] if k + 1 < len(points) else refZ) - z)
+            continue
+
+        left = staircase.bisect_left((x, -math.inf))
+        removed = []
+        while left < len(staircase) and staircase[left][1] >= y:
+            removed.append(staircase.pop(left))
+        rightX = staircase[left][0] if left < len(staircase) else refX
+
+        # Area the new point adds over the staircase between x and rightX
+        previousX, previousY = x, staircase[left - 1][1] if left > 0 else refY
+        covered = 0.0
+        for removedX, removedY in removed:
+            covered += (removedX - previousX) * (refY - previousY)
+            previousX, previousY = removedX, removedY
+        covered += (rightX - previousX) * (refY - previousY)
+        area += (rightX - x) * (refY - y) - covered
+        staircase.add((x, y))
+
+        volume += area * ((points[k + 1, 2] if k + 1 < len(points) else refZ) - z)
+
+    return volume
+
+
+class ConvergenceTracker:
+    # Hypervolume and churn of front 0 every generation, plus the optional
+    # stopping rules: `patience` generations without hypervolume improvement,
+    # a wall clock budget in seconds and a target hypervolume. Patience counts
+    # generations, not updates, island runs only update once per epoch.
+    def __init__(self, boxTable, gridX, gridY, gridZ, patience=0, timeBudget=0, targetHypervolume=None, tolerance=1e-9):
+        self.boxTable = boxTable
+        self.gridX = gridX
+        self.gridY = gridY
+        self.gridZ = gridZ
+        self.patience = patience
+        self.timeBudget = timeBudget
+        self.targetHypervolume = targetHypervolume
+        self.tolerance = tolerance
+        self.bestHypervolume = None
+        self.bestGeneration = None
+        self.generation = None
+        self.previousKeys = None
+        self.startTime = time.monotonic()
+
+    def start(self):
+        self.startTime = time.monotonic()
+
+    def update(self, generation, front):
+        value = hypervolume(normalizedObjectives(
+            front, self.boxTable, self.gridX, self.gridY, self.gridZ))
+
+        # Share of front 0 that was not in the previous front 0
+        keys = {individual.genome.key() for individual in front}
+        churn = 1.0 if self.previousKeys is None or len(keys) == 0 else \
+            len(keys - self.previousKeys) / len(keys)
+        self.previousKeys = keys
+
+        self.generation = generation
+        if self.bestHypervolume is None or value > self.bestHypervolume + self.tolerance:
+            self.bestHypervolume = value
+            self.bestGeneration = generation
+
+        return {'generation': generation,
+                'hypervolume': value, 'churn': churn}
+
+    def stopReason(self):
+        if self.targetHypervolume is not None and self.bestHypervolume is not None and \
+                self.bestHypervolume >= self.targetHypervolume:
+            return 'target'
+        if self.patience > 0 and self.bestGeneration is not None and \
+                self.generation - self.bestGeneration >= self.patience:
+            return 'converged'
+        if self.timeBudget > 0 and time.monotonic() - self.startTime >= self.timeBudget:
+            return 'time_budget'
+        return None
@@ -2,37 +2,61 @@ import csv
 import os
 import random
 from population import Population
-from box import Box
+from genome import BoxTable, Genome
 from individual import Individual
 
 
-def generate_population(box_count, count):
-    return [random.sample(list(range(1, box_count + 1)), box_count) for i in range(count)]
+def generate_population(box_count, count, rng=random):
+    return [rng.sample(list(range(1, box_count + 1)), box_count) for i in range(count)]
 
 
-def loadData(boxData, gridX, gridY, gridZ, populationSize):
+def loadData(boxData, gridX, gridY, gridZ, populationSize, seeding=None, rng=None, prefixCache=None):
+    # rng is a random.Random of the job, the global random module otherwise.
+    # Decoding through the run's prefix cache leaves snapshots of every
+    # initial individual for their children to resume from.
+    rng = rng if rng is not None else random
+
     # Read boxes data
     templateBoxes = []
     for box in boxData:
         box = [int(b) for b in box]
         templateBoxes.append(box)
 
-    population_data = generate_population(len(templateBoxes), populationSize)
+    boxTable = BoxTable(templateBoxes)
+
+    # Warm start individuals first, random ones for the remaining places
+    seeds = seeding.genomes(
+        boxTable, populationSize) if seeding is not None else []
+    population_data = generate_population(
+        len(templateBoxes), populationSize - len(seeds), rng)
 
-    # Read population data
     population = Population()
+    fixedOrientations = {box[0]: box[5]
+                         for box in templateBoxes if len(box) == 6}
+    for genome in seeds:
+        # Provided orientations hold for seeds too
+        for position, code in enumerate(genome.codes.tolist()):
+            if code in fixedOrientations:
+                genome.orientations[position] = fixedOrientations[code]
+        population.append(Individual(
+            genome, boxTable, gridX, gridY, gridZ, prefixCache=prefixCache))
+
+    # Read population data
     for pop in population_data:
         pop = [int(p) for p in pop]
-        boxes = []
+        codes = []
+        orientations = []
         for p in pop:
+            codes.append(templateBoxes[p - 1][0])
             # If orientation not provided, randomize
             if len(templateBoxes[p - 1]) == 5:
-                boxes.append(Box(*templateBoxes[p - 1], random.randint(0, 1)))
+                orientations.append(rng.randint(0, 1))
             # If orientation provided
             elif len(templateBoxes[p - 1]) == 6:
-                boxes.append(Box(*templateBoxes[p - 1]))
+                orientations.append(templateBoxes[p - 1][5])
             else:
                 raise Exception("Invalid box data")
-        population.append(Individual(boxes, gridX, gridY, gridZ))
+        population.append(Individual(
+            Genome(codes, orientations), boxTable, gridX, gridY, gridZ, prefixCache=prefixCache))
 
     return population
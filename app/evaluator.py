@@ -0,0 +1,146 @@
+import os
+import multiprocessing
+from collections import OrderedDict
+from genome import Genome
+from individual import Individual
+from prefix_cache import PrefixCache
+
+# Box table and grid of the current job, set once per worker process
+workerContext = None
+
+# Memory budget of a run's decode results, and what an entry costs besides
+# its arrays (key, tuples, objectives dict, array headers)
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+ENTRY_OVERHEAD = 512
+
+
+def initWorker(boxTable, gridX, gridY, gridZ, prefixInterval, prefixCacheBytes):
+    global workerContext
+    workerContext = (boxTable, gridX, gridY, gridZ,
+                     PrefixCache(prefixInterval, prefixCacheBytes) if prefixInterval > 0 else None)
+
+
+def decodeGenome(genome):
+    # genome is a (codes, orientations) pair of arrays, every worker keeps
+    # its own prefix snapshots
+    boxTable, gridX, gridY, gridZ, prefixCache = workerContext
+    return Individual(Genome(*genome), boxTable, gridX, gridY, gridZ, prefixCache=prefixCache).getDecoded()
+
+
+class DecodeCache:
+    # LRU of decode results keyed by genome digest and grid size, the least
+    # recently used results go once they take over maxBytes
+    def __init__(self, maxBytes=DEFAULT_CACHE_BYTES):
+        self.maxBytes = maxBytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, decoded):
+        size = self.sizeOf(decoded)
+        if size > self.maxBytes:
+            return
+        if key in self.entries:
+            self.bytes -= self.sizeOf(self.entries[key])
+        self.entries[key] = decoded
+        self.entries.move_to_end(key)
+        self.bytes += size
+        while self.bytes > self.maxBytes:
+            self.bytes -= self.sizeOf(self.entries.popitem(last=False)[1])
+
+    @staticmethod
+    def sizeOf(decoded):
+        insertedIndices, positions = decoded[:2]
+        return insertedIndices.nbytes + positions.nbytes + ENTRY_OVERHEAD
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries),
+                'bytes': self.bytes, 'max_bytes': self.maxBytes}
+
+
+class Evaluator:
+    def __init__(self, boxTable, gridX, gridY, gridZ, workers=0, cache=None, prefixInterval=0, prefixCache=None):
+        self.boxTable = boxTable
+        self.cache = cache if cache is not None else DecodeCache()
+        # Prefix snapshots are opt-in, a given prefix cache may already hold
+        # the snapshots of the initial population
+        if prefixCache is None and prefixInterval > 0:
+            prefixCache = PrefixCache(prefixInterval)
+        self.prefixCache = prefixCache
+        self.gridX = gridX
+        self.gridY = gridY
+        self.gridZ = gridZ
+        self.workers = min(workers, os.cpu_count() or 1)
+        self.pool = None
+
+        # Only worth starting processes when there is more than one
+        if self.workers > 1:
+            # Every worker keeps its own snapshots in an equal share of the
+            # cache's budget, the ones held here are no use to them
+            interval, budget = 0, 0
+            if prefixCache is not None:
+                interval, budget = prefixCache.interval, prefixCache.maxBytes // self.workers
+                prefixCache.clear()
+            # spawn, so workers do not inherit the server's threads and sockets
+            self.pool = multiprocessing.get_context('spawn').Pool(
+                self.workers, initializer=initWorker, initargs=(boxTable, gridX, gridY, gridZ, interval, budget))
+
+    @staticmethod
+    def boxTableFor(population):
+        # Shared by all individuals of a run
+        return population.individuals[0].boxTable
+
+    def evaluate(self, children):
+        # Look up every child first, repeated genomes are decoded only once
+        keys = [(child.key(), self.gridX, self.gridY, self.gridZ)
+                for child in children]
+        decoded = {}
+        for key in keys:
+            if key not in decoded:
+                decoded[key] = self.cache.get(key)
+
+        pending = OrderedDict()
+        for child, key in zip(children, keys):
+            if decoded[key] is None and key not in pending:
+                pending[key] = child
+
+        for key, result in zip(pending, self.__decode(list(pending.values()))):
+            decoded[key] = result
+            self.cache.put(key, result)
+
+        return [Individual(child, self.boxTable, self.gridX, self.gridY, self.gridZ, decoded=decoded[key])
+                for child, key in zip(children, keys)]
+
+    def __decode(self, genomes):
+        if self.pool is None:
+            return [Individual(genome, self.boxTable, self.gridX, self.gridY, self.gridZ,
+                               prefixCache=self.prefixCache).getDecoded()
+                    for genome in genomes]
+
+        # Results come back in submission order, so runs stay deterministic
+        chunkSize = max(1, len(genomes) // (self.workers * 4))
+        return self.pool.map(decodeGenome, [(genome.codes, genome.orientations) for genome in genomes], chunkSize)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
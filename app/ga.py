@@ -1,208 +1,505 @@
-import random
 import os
+import random
+import numpy as np
 from tqdm import tqdm
 from population import Population
-from individual import Individual
-from box import Box
-from flask_socketio import SocketIO
+from genome import BoxTable, Genome
+import ranking
+import checkpoint
+from evaluator import Evaluator, DecodeCache, DEFAULT_CACHE_BYTES
+from prefix_cache import PrefixCache, DEFAULT_BYTES
+from islands import IslandModel
+from convergence import ConvergenceTracker
+from history import ObjectiveHistory
+from instrumentation import Instrumentation
+from progress import ProgressReporter, getEmitter
+
+
+class RunCancelled(Exception):
+    pass
 
 
 class GeneticAlgorithm:
-    def __init__(self, population, mutationProbability, maxGeneration, room_id):
+    def __init__(self, population, mutationProbability, maxGeneration, room_id, sortingBackend='numpy', workers=0, cacheBytes=DEFAULT_CACHE_BYTES, prefixInterval=0,
+                 prefixCache=None, prefixCacheBytes=DEFAULT_BYTES,
+                 socket=None, cancelEvent=None, progressInterval=0.5, progressStride=1, jobId=None, profile=False,
+                 islands=1, migrationInterval=10, migrants=2, checkpointPath=None, checkpointInterval=0,
+                 patience=0, timeBudget=0, targetHypervolume=None, rng=None, historySize=4096, historyMode='downsample'):
+        if sortingBackend not in ranking.SORTING_BACKENDS:
+            raise ValueError("sortingBackend must be one of {}".format(
+                list(ranking.SORTING_BACKENDS)))
+        # Every island is a process, like the decode pool never more of them
+        # than there are CPUs. Checked even under -O, islands come from job
+        # payloads.
+        if islands > (os.cpu_count() or 1):
+            raise ValueError("islands must be at most {}".format(
+                os.cpu_count() or 1))
+        if islands > 1 and len(population) < 2 * islands:
+            raise ValueError("population_size must be at least 2 per island")
+        # Checkpoints hold one population, islands keep theirs in their own
+        # processes
+        if islands > 1 and checkpointPath is not None and checkpointInterval > 0:
+            raise ValueError(
+                "checkpoint_interval is not supported with islands")
         self.mutationProbability = mutationProbability
         self.population = population
         self.maxGeneration = maxGeneration
         self.individualCount = len(population)
         self.finalPopulation = None
         self.room_id = room_id
-        self.socket = SocketIO(message_queue=os.getenv(
-            'REDIS_URL'), cors_allowed_origins=os.getenv('CLIENT_ORIGIN'))
+        self.sortingBackend = sortingBackend
+        self.workers = workers
+        self.prefixInterval = prefixInterval
+        self.prefixCacheBytes = prefixCacheBytes
+        self.cacheBytes = cacheBytes
+        self.islands = islands
+        self.migrationInterval = max(1, migrationInterval)
+        self.migrants = migrants
+        self.checkpointPath = checkpointPath
+        self.checkpointInterval = checkpointInterval if checkpointPath is not None else 0
+        # Generations done so far and, when resumed, the children of the
+        # last one
+        self.generation = 0
+        self.children = None
+        # Batched selection and variation draws, seeded from the job's
+        # random.Random (the global random without one) so a seeded run stays
+        # reproducible
+        self.random = rng if rng is not None else random
+        self.npRandom = np.random.default_rng(self.random.getrandbits(64))
+        # Prefix snapshots are opt-in (prefixInterval > 0). prefixCache holds
+        # the initial population's snapshots when it was decoded through it
+        # (data_gen.loadData).
+        boxTable = Evaluator.boxTableFor(population)
+        if prefixCache is None and prefixInterval > 0:
+            prefixCache = PrefixCache(prefixInterval, prefixCacheBytes)
+        self.evaluator = Evaluator(boxTable, population.individuals[0].gridX,
+                                   population.individuals[0].gridY, population.individuals[0].gridZ,
+                                   cache=DecodeCache(cacheBytes), prefixInterval=prefixInterval, prefixCache=prefixCache)
+        self.cancelEvent = cancelEvent
+        # Front 0 hypervolume and churn every generation, and early stopping
+        self.convergence = ConvergenceTracker(self.evaluator.boxTable, self.evaluator.gridX, self.evaluator.gridY,
+                                              self.evaluator.gridZ, patience=patience, timeBudget=timeBudget,
+                                              targetHypervolume=targetHypervolume)
+        self.stopReason = None
+        # Compact per generation statistics for charts and progress
+        self.history = ObjectiveHistory(historySize, historyMode)
+        self.socket = socket if socket is not None else getEmitter()
+        self.stats = Instrumentation(profile=profile)
+        self.progress = ProgressReporter(
+            self.socket, room_id, minInterval=progressInterval, stride=progressStride, jobId=jobId)
 
     def start(self):
+        # Decode children on a process pool for the duration of the run,
+        # islands decode in their own processes instead
+        serialEvaluator = self.evaluator
+        if self.workers > 1 and self.islands <= 1:
+            self.evaluator = Evaluator(Evaluator.boxTableFor(self.population), serialEvaluator.gridX,
+                                       serialEvaluator.gridY, serialEvaluator.gridZ, workers=self.workers,
+                                       cache=serialEvaluator.cache, prefixInterval=self.prefixInterval,
+                                       prefixCache=serialEvaluator.prefixCache)
+        self.stats.startProfile()
+        self.convergence.start()
+        try:
+            if self.islands > 1:
+                self.__evolveIslands()
+            else:
+                self.__evolve()
+        finally:
+            self.stats.stopProfile()
+            self.evaluator.close()
+            self.evaluator = serialEvaluator
+            self.recordCacheCounters()
+
+    def __evolve(self):
+        children = self.children if self.children is not None else self.prepare()
+        self.children = None
+
+        with tqdm(total=self.maxGeneration, initial=self.generation, desc="Generation") as t:
+            for generation in range(self.generation, self.maxGeneration):
+                # Stop between generations when the job was cancelled
+                if self.cancelEvent is not None and self.cancelEvent.is_set():
+                    raise RunCancelled()
+
+                self.stats.beginGeneration(generation)
+                children = self.step(children)
+                self.generation = generation + 1
+
+                if self.checkpointInterval > 0 and self.generation % self.checkpointInterval == 0:
+                    self.saveCheckpoint(children)
+
+                with self.stats.stage('convergence'):
+                    record = self.convergence.update(
+                        self.generation, self.population.fronts[0])
+                    self.stopReason = self.convergence.stopReason()
+                with self.stats.stage('history'):
+                    self.history.record(
+                        self.generation, self.population, record)
+
+                t.update()
+                with self.stats.stage('progress'):
+                    self.progress.update(
+                        t.n, self.population, t.format_dict, history=self.history)
+                self.stats.count('generations')
+                self.stats.endGeneration()
+
+                if self.stopReason is not None:
+                    break
+
+            # Checkpoint the last generation too, so the run can be extended
+            if self.checkpointInterval > 0 and self.generation % self.checkpointInterval != 0:
+                self.saveCheckpoint(children)
+
+            # Always report the last generation
+            self.progress.update(t.n, self.population,
+                                 t.format_dict, force=True, history=self.history)
+
+    def __evolveIslands(self):
+        # The islands split the snapshot budget, this process decodes nothing
+        if self.evaluator.prefixCache is not None:
+            self.evaluator.prefixCache.clear()
+        islands = None
+        try:
+            islands = IslandModel(self.population, self.islands, self.evaluator.boxTable, self.evaluator.gridX,
+                                  self.evaluator.gridY, self.evaluator.gridZ, self.__islandOptions(), rng=self.random)
+            immigrants = [[] for _ in range(self.islands)]
+            with tqdm(total=self.maxGeneration, desc="Generation") as t:
+                while t.n < self.maxGeneration:
+                    # Islands only stop between epochs
+                    if self.cancelEvent is not None and self.cancelEvent.is_set():
+                        raise RunCancelled()
+
+                    generations = min(self.migrationInterval,
+                                      self.maxGeneration - t.n)
+                    self.stats.beginGeneration(t.n)
+                    with self.stats.stage('islands'):
+                        fronts = islands.evolve(generations, immigrants)
+
+                    # Ring migration, every island sends the most spread out
+                    # part of its front 0 to the next one
+                    immigrants = [front[:self.migrants]
+                                  for front in fronts[-1:] + fronts[:-1]]
+                    self.stats.count('migrants', sum(
+                        len(front) for front in immigrants))
+
+                    # Progress of the combined front of all islands
+                    t.update(generations)
+                    self.generation = t.n
+                    with self.stats.stage('progress'):
+                        merged = Population()
+                        merged.extend(
+                            [individual for front in fronts for individual in front])
+                        self.fastNonDominatedSort(merged)
+                        with self.stats.stage('convergence'):
+                            record = self.convergence.update(
+                                t.n, merged.fronts[0])
+                            self.stopReason = self.convergence.stopReason()
+                        with self.stats.stage('history'):
+                            self.history.record(t.n, merged, record)
+                        self.progress.update(
+                            t.n, merged, t.format_dict, history=self.history)
+                    self.stats.count('generations', generations)
+                    self.stats.endGeneration()
+
+                    if self.stopReason is not None:
+                        break
+
+                individuals, summaries = islands.collect()
+
+                # Merge sort of every island's final population
+                self.population = Population()
+                self.population.extend(individuals)
+                self.fastNonDominatedSort(self.population)
+                self.calculateCrowdingDistances(self.population.fronts)
+                self.finalPopulation = self.population
+                for summary in summaries:
+                    self.stats.merge(summary)
+
+                self.progress.update(t.n, self.population,
+                                     t.format_dict, force=True, history=self.history)
+        finally:
+            if islands is not None:
+                islands.close()
+
+    def __islandOptions(self):
+        return {'mutationProbability': self.mutationProbability, 'sortingBackend': self.sortingBackend,
+                'cacheBytes': self.cacheBytes // self.islands, 'prefixInterval': self.prefixInterval,
+                'prefixCacheBytes': self.prefixCacheBytes // self.islands}
+
+    def prepare(self):
+        # Rank the initial population and breed its first children
         self.fastNonDominatedSort(self.population)
-        for front in self.population.fronts:
-            self.calculateCrowdingDistance(front)
+        self.calculateCrowdingDistances(self.population.fronts)
         children = self.createChildren(self.population)
 
         # Save current population and advance to next generation
         self.finalPopulation = self.population
+        return children
 
-        with tqdm(total=self.maxGeneration, desc="Generation") as t:
-            for _ in range(self.maxGeneration):
-                self.population.extend(children)
-                self.fastNonDominatedSort(self.population)
-                newPopulation = Population()
-                frontNum = 0
-
-                # Remove individuals that exceed max indvidualCount
-                # sorted by rank and crowding distance
-                while len(newPopulation) + len(self.population.fronts[frontNum]) <= self.individualCount:
-                    self.calculateCrowdingDistance(
-                        self.population.fronts[frontNum])
-                    newPopulation.extend(self.population.fronts[frontNum])
-                    frontNum += 1
-
-                self.calculateCrowdingDistance(
-                    self.population.fronts[frontNum])
-                self.population.fronts[frontNum].sort(
-                    key=lambda individual: individual.crowdingDistance, reverse=True)
-                newPopulation.extend(
-                    self.population.fronts[frontNum][0:self.individualCount - len(newPopulation)])
-
-                self.population = newPopulation
-
-                self.fastNonDominatedSort(self.population)
-                for front in self.population.fronts:
-                    self.calculateCrowdingDistance(front)
-                children = self.createChildren(self.population)
+    def step(self, children):
+        # One generation: survivors of parents plus children, then their
+        # children
+        self.population.extend(children)
+        self.population = self.selectSurvivors(self.population)
+        children = self.createChildren(self.population)
 
-                # Save current population and advance to next generation
-                self.finalPopulation = self.population
+        # Save current population and advance to next generation
+        self.finalPopulation = self.population
+        return children
 
-                t.update()
-                self.socket.emit(
-                    'ga-progress', t.format_dict, room=self.room_id)
+    def saveCheckpoint(self, children):
+        # Survivors and pending children of the current generation, the
+        # random states and everything needed to rebuild the run
+        with self.stats.stage('checkpoint'):
+            boxTable = self.evaluator.boxTable
+            codes, orientations = checkpoint.packGenomes(
+                [individual.genome for individual in self.population.individuals])
+            childCodes, childOrientations = checkpoint.packGenomes(
+                [child.genome for child in children])
+            checkpoint.writeCheckpoint(self.checkpointPath, codes=codes, orientations=orientations,
+                                       child_codes=childCodes, child_orientations=childOrientations,
+                                       boxes=np.column_stack(
+                                           [boxTable.codes, boxTable.dimensions[boxTable.codes]]),
+                                       grid=np.array(
+                                           [self.evaluator.gridX, self.evaluator.gridY, self.evaluator.gridZ]),
+                                       generation=np.array(self.generation),
+                                       max_generation=np.array(self.maxGeneration),
+                                       mutation_probability=np.array(self.mutationProbability),
+                                       sorting_backend=np.array(self.sortingBackend),
+                                       checkpoint_interval=np.array(self.checkpointInterval),
+                                       **checkpoint.packRandomState(self.random, self.npRandom))
+        self.stats.count('checkpoints')
+
+    @classmethod
+    def fromCheckpoint(cls, path, room_id, maxGeneration=None, **kwargs):
+        # Continue a run from its last checkpoint, maxGeneration extends it
+        state = checkpoint.readCheckpoint(path)
+        boxTable = BoxTable(state['boxes'].tolist())
+        gridX, gridY, gridZ = state['grid'].tolist()
+        # The restored population is decoded through the run's prefix cache,
+        # like a fresh one
+        interval = kwargs['prefixInterval'] if 'prefixInterval' in kwargs else 0
+        prefixCache = PrefixCache(interval, kwargs['prefixCacheBytes'] if 'prefixCacheBytes' in kwargs else DEFAULT_BYTES) \
+            if interval > 0 else None
+        evaluator = Evaluator(boxTable, gridX, gridY, gridZ,
+                              prefixInterval=interval, prefixCache=prefixCache)
+        kwargs.setdefault('prefixCache', prefixCache)
+        population = Population()
+        population.extend(evaluator.evaluate([Genome(codes, orientations)
+                                              for codes, orientations in zip(state['codes'], state['orientations'])]))
+
+        kwargs.setdefault('sortingBackend', str(state['sorting_backend']))
+        kwargs.setdefault('checkpointPath', path)
+        kwargs.setdefault('checkpointInterval', int(
+            state['checkpoint_interval']))
+        GA = cls(population, float(state['mutation_probability']),
+                 int(state['max_generation']) if maxGeneration is None else maxGeneration, room_id, **kwargs)
+        GA.generation = int(state['generation'])
+        GA.children = evaluator.evaluate([Genome(codes, orientations)
+                                          for codes, orientations in zip(state['child_codes'], state['child_orientations'])])
+        GA.fastNonDominatedSort(population)
+        GA.calculateCrowdingDistances(population.fronts)
+        GA.finalPopulation = population
+        checkpoint.restoreRandomState(state, GA.random, GA.npRandom)
+        return GA
+
+    def recordCacheCounters(self):
+        self.stats.count('decode_cache_hits', self.evaluator.cache.hits)
+        self.stats.count('decode_cache_misses', self.evaluator.cache.misses)
+        if self.evaluator.prefixCache is not None:
+            self.stats.count('prefix_cache_hits',
+                             self.evaluator.prefixCache.hits)
+            self.stats.count('prefix_cache_misses',
+                             self.evaluator.prefixCache.misses)
+            self.stats.count('prefix_cache_genes_skipped',
+                             self.evaluator.prefixCache.genesSkipped)
+
+    def selectSurvivors(self, population):
+        # Sort the merged population once, keep whole fronts while they fit
+        # and the most spread out part of the first one that does not.
+        # Survivors keep the ranks and crowding distances from this sort: a
+        # second sort of them would give the same fronts, except for the
+        # order of the truncated front, which is rebuilt below.
+        self.fastNonDominatedSort(population)
+        newPopulation = Population()
+        frontNum = 0
+
+        # Remove individuals that exceed max indvidualCount
+        # sorted by rank and crowding distance
+        while len(newPopulation) + len(population.fronts[frontNum]) <= self.individualCount:
+            newPopulation.extend(population.fronts[frontNum])
+            frontNum += 1
+
+        # Crowding of every kept front and the truncated one in one
+        # pass, using the ranks from the sort above
+        self.calculateCrowdingDistances(population.fronts[:frontNum + 1])
+        with self.stats.stage('selection'):
+            lastFront = sorted(population.fronts[frontNum],
+                               key=lambda individual: individual.crowdingDistance, reverse=True)
+            lastFront = lastFront[0:self.individualCount - len(newPopulation)]
+            newPopulation.extend(lastFront)
+
+            newPopulation.fronts = population.fronts[:frontNum]
+            if len(lastFront) > 0:
+                if frontNum > 0:
+                    lastFront = [lastFront[i] for i in ranking.releaseOrder(
+                        population.fronts[frontNum - 1], lastFront)]
+                newPopulation.fronts.append(lastFront)
+            newPopulation.fronts.append([])
+
+        # Only the truncated front lost members, so only its crowding changes
+        self.calculateCrowdingDistance(lastFront)
+
+        return newPopulation
 
     def fastNonDominatedSort(self, population):
-        population.fronts = [[]]
-        for individual in population:
-            individual.dominationCount = 0
-            individual.dominatedSolutions = []
-            for otherIndividual in population:
-                if individual.dominates(otherIndividual):
-                    individual.dominatedSolutions.append(otherIndividual)
-                elif otherIndividual.dominates(individual):
-                    individual.dominationCount += 1
-            if individual.dominationCount == 0:
-                individual.rank = 0
-                population.fronts[0].append(individual)
-        i = 0
-        while len(population.fronts[i]) > 0:
-            temp = []
-            for individual in population.fronts[i]:
-                for otherIndividual in individual.dominatedSolutions:
-                    otherIndividual.dominationCount -= 1
-                    if otherIndividual.dominationCount == 0:
-                        otherIndividual.rank = i + 1
-                        temp.append(otherIndividual)
-            i = i + 1
-            population.fronts.append(temp)
+        with self.stats.stage('sort'):
+            fronts = ranking.SORTING_BACKENDS[self.sortingBackend](
+                population.individuals)
+
+        # Keep the trailing empty front the loop version always produced
+        population.fronts = []
+        for rank, front in enumerate(fronts + [[]]):
+            population.fronts.append(
+                [population.individuals[i] for i in front])
+            for individual in population.fronts[rank]:
+                individual.rank = rank
 
     def calculateCrowdingDistance(self, front):
-        if len(front) > 0:
-            individualCount = len(front)
-
-            # Set default crowdingDistance to 0
-            for individual in front:
-                individual.crowdingDistance = 0
-
-            # Loop through objectives
-            for key in front[0].objectives:
-                front.sort(key=lambda individual: individual.objectives[key])
-
-                # Set individual with the maximum and minimum objectives value
-                # to really big number, so it always chosen first
-                front[0].crowdingDistance = 10**5
-                front[individualCount - 1].crowdingDistance = 10**5
-                mValues = [individual.objectives[key] for individual in front]
-
-                # Calculate scale to normalize
-                scale = max(mValues) - min(mValues)
-
-                # Avoid divide by 0
-                scale = scale if scale != 0 else 1
-
-                # Calculate crowdingDistance for other individuals
-                for i in range(1, individualCount - 1):
-                    front[i].crowdingDistance += (
-                        front[i + 1].objectives[key] - front[i - 1].objectives[key]) / scale
+        self.calculateCrowdingDistances([front])
+
+    def calculateCrowdingDistances(self, fronts):
+        # One batched pass over every given front, the front lists are left
+        # in their order
+        with self.stats.stage('crowding'):
+            individuals = [individual for front in fronts for individual in front]
+            frontIds = np.repeat(np.arange(len(fronts)), [
+                                 len(front) for front in fronts])
+            distances = ranking.crowdingDistances(
+                ranking.crowdingValues(individuals), frontIds)
+            for individual, distance in zip(individuals, distances.tolist()):
+                individual.crowdingDistance = distance
 
     def createChildren(self, population):
-        children = []
-        while len(children) < len(population):
-            parent1 = self.__tournament(population)
-            parent2 = parent1
-            while parent1 == parent2:
-                parent2 = self.__tournament(population)
-            child = self.__crossover(parent1, parent2)
-            if random.random() < self.mutationProbability:
-                self.__mutate(child, parent1)
-            children.append(Individual(child, parent1.gridX,
-                                       parent1.gridY, parent1.gridZ))
+        with self.stats.stage('variation'):
+            children = self.__variation(population)
+
+        with self.stats.stage('decode'):
+            individuals = self.evaluator.evaluate(children)
+        self.stats.count('children', len(children))
+
+        return individuals
+
+    def __variation(self, population):
+        individuals = population.individuals
+        childCount = len(population)
+        geneCount = len(individuals[0].genome)
+        parents = self.selectParents(population, childCount)
+
+        # Crossover points for every child, same rule as drawing two distinct
+        # cut points one child at a time
+        cxpoints1 = self.npRandom.integers(0, geneCount + 1, childCount)
+        cxpoints2 = self.npRandom.integers(0, geneCount, childCount)
+        cxpoints2 += cxpoints2 >= cxpoints1
+        cxpoints1, cxpoints2 = np.minimum(cxpoints1, cxpoints2), \
+            np.maximum(cxpoints1, cxpoints2)
+
+        # All children live in two (children, genes) matrices, each Genome is
+        # a view of its row
+        codes = np.empty((childCount, geneCount), dtype=np.int32)
+        orientations = np.empty((childCount, geneCount), dtype=np.uint8)
+        children = [Genome(codes[k], orientations[k])
+                    for k in range(childCount)]
+        for child, (parent1, parent2), cxpoint1, cxpoint2 in zip(children, parents.tolist(), cxpoints1.tolist(), cxpoints2.tolist()):
+            self.__crossover(individuals[parent1].genome, individuals[parent2].genome,
+                             cxpoint1, cxpoint2, child)
+
+        self.__mutate(codes, orientations)
 
         return children
 
-    def __mutate(self, child, std):
-        rng = random.random()
+    def selectParents(self, population, count):
+        # Binary tournaments for `count` children at once, returns the
+        # (count, 2) matrix of parent indices into population.individuals
+        individuals = population.individuals
+        ranks = np.array([individual.rank for individual in individuals])
+        crowding = np.array(
+            [individual.crowdingDistance for individual in individuals], dtype=float)
+
+        parents = np.empty((count, 2), dtype=np.int64)
+        parents[:, 0] = self.__tournaments(ranks, crowding, count)
+        if len(individuals) == 2:
+            # Both tournaments always see the same pair, take the other one
+            parents[:, 1] = 1 - parents[:, 0]
+            return parents
+
+        # The two parents of a child must differ, redraw the second
+        # tournament until they do
+        parents[:, 1] = self.__tournaments(ranks, crowding, count)
+        same = np.flatnonzero(parents[:, 0] == parents[:, 1])
+        while len(same) > 0:
+            parents[same, 1] = self.__tournaments(ranks, crowding, len(same))
+            same = same[parents[same, 0] == parents[same, 1]]
+
+        return parents
+
+    def __tournaments(self, ranks, crowding, count):
+        # Two distinct random contestants per tournament, the lower rank wins
+        # and a tie goes to the larger crowding distance
+        contestant1 = self.npRandom.integers(0, len(ranks), count)
+        contestant2 = self.npRandom.integers(0, len(ranks) - 1, count)
+        contestant2 += contestant2 >= contestant1
+
+        firstWins = (ranks[contestant1] < ranks[contestant2]) | \
+            ((ranks[contestant1] == ranks[contestant2]) &
+             (crowding[contestant1] > crowding[contestant2]))
+        return np.where(firstWins, contestant1, contestant2)
+
+    def __mutate(self, codes, orientations):
+        # Mutate a random subset of the children rows in place
+        childCount, geneCount = codes.shape
+        mutated = np.flatnonzero(self.npRandom.random(
+            childCount) < self.mutationProbability)
+        swap = self.npRandom.random(len(mutated)) < 0.5
+        positions = self.npRandom.integers(0, geneCount, (len(mutated), 2))
 
         # Swap packing order
-        if rng < 0.5:
-            pos1 = random.randint(0, len(child) - 1)
-            pos2 = random.randint(0, len(child) - 1)
-            tmp = child[pos1]
-            child[pos1] = child[pos2]
-            child[pos2] = tmp
+        rows = mutated[swap]
+        pos1, pos2 = positions[swap, 0], positions[swap, 1]
+        codes[rows, pos1], codes[rows, pos2] = codes[rows, pos2], codes[rows, pos1]
+        orientations[rows, pos1], orientations[rows, pos2] = \
+            orientations[rows, pos2], orientations[rows, pos1]
+
         # Flip orientation
-        else:
-            pos = random.randint(0, len(child) - 1)
-            child[pos].orientation = (child[pos].orientation + 1) % 2
+        rows = mutated[~swap]
+        orientations[rows, positions[~swap, 0]] ^= 1
+
+    def __crossover(self, parent1, parent2, cxpoint1, cxpoint2, child):
+        # PMX crossover, segment from parent1 and the rest from parent2
+        child.codes[:] = parent2.codes
+        child.orientations[:] = parent2.orientations
+        child.codes[cxpoint1:cxpoint2] = parent1.codes[cxpoint1:cxpoint2]
+        child.orientations[cxpoint1:cxpoint2] = parent1.orientations[cxpoint1:cxpoint2]
+
+        # Position of every code in each parent
+        codeCount = len(self.evaluator.boxTable.dimensions)
+        pos1 = np.zeros(codeCount, dtype=np.int32)
+        pos2 = np.zeros(codeCount, dtype=np.int32)
+        pos1[parent1.codes] = np.arange(len(parent1))
+        pos2[parent2.codes] = np.arange(len(parent2))
+        inSegment = np.zeros(codeCount, dtype=bool)
+        inSegment[parent1.codes[cxpoint1:cxpoint2]] = True
+
+        # Codes outside the segment that parent1's segment already used are
+        # replaced by following the parent1 -> parent2 mapping out of it
+        outside = np.r_[0:cxpoint1, cxpoint2:len(parent2)]
+        conflicts = outside[inSegment[parent2.codes[outside]]]
+        codes = parent2.codes[conflicts]
+        pending = inSegment[codes]
+        while pending.any():
+            codes[pending] = parent2.codes[pos1[codes[pending]]]
+            pending = inSegment[codes]
+
+        child.codes[conflicts] = codes
+        child.orientations[conflicts] = parent2.orientations[pos2[codes]]
 
         return child
-
-    def __crossover(self, ind1, ind2):
-        # Deep copy box
-        parent1 = [Box(box.code, box.length, box.width, box.height,
-                       box.weight, box.orientation) for box in ind1.boxes]
-        parent2 = [Box(box.code, box.length, box.width, box.height,
-                       box.weight, box.orientation) for box in ind2.boxes]
-
-        # PMX crossover
-        pos1 = [0] * (len(parent1) + 1)
-        pos2 = [0] * (len(parent2) + 1)
-        done = [False] * (len(parent1) + 1)
-
-        for i in range(len(parent1)):
-            pos1[parent1[i].code] = i
-
-        for i in range(len(parent2)):
-            pos2[parent2[i].code] = i
-
-        # Choose crossover points
-        cxpoint1 = random.randint(0, len(parent1))
-        cxpoint2 = random.randint(0, len(parent1) - 1)
-        if cxpoint2 >= cxpoint1:
-            cxpoint2 += 1
-        else:  # Swap the two cx points
-            cxpoint1, cxpoint2 = cxpoint2, cxpoint1
-
-        children = [None] * len(parent1)
-        for i in range(cxpoint1, cxpoint2):
-            children[i] = parent1[i]
-            done[parent1[i].code] = True
-
-        for i in range(cxpoint1, cxpoint2):
-            if not done[parent2[i].code]:
-                found_pos = pos2[parent1[i].code]
-                while children[found_pos] != None:
-                    found_pos = pos2[parent1[found_pos].code]
-                children[found_pos] = parent2[i]
-                done[parent2[i].code] = True
-
-        j = 0
-        for i in range(len(parent2)):
-            if not done[parent2[i].code]:
-                while children[j] != None:
-                    j += 1
-                children[j] = parent2[i]
-                done[parent2[i].code] = True
-
-        return children
-
-    def __tournament(self, population):
-        selectedIndividuals = random.sample(population.individuals, 2)
-        if selectedIndividuals[0].rank < selectedIndividuals[1].rank:
-            return selectedIndividuals[0]
-        elif selectedIndividuals[0].rank == selectedIndividuals[1].rank and selectedIndividuals[0].crowdingDistance > selectedIndividuals[1].crowdingDistance:
-            return selectedIndividuals[0]
-        else:
-            return selectedIndividuals[1]
@@ -0,0 +1,56 @@
+import hashlib
+import numpy as np
+
+
+class BoxTable:
+    # Read-only dimensions of every box in a load, indexed by box code and
+    # shared by all genomes of a run
+    def __init__(self, boxData):
+        boxData = [list(box[:5]) for box in boxData]
+        values = np.array([box[1:] for box in boxData]).reshape(-1, 4)
+
+        dimensions = np.zeros(
+            (max([box[0] for box in boxData], default=0) + 1, 4), dtype=values.dtype)
+        for box, value in zip(boxData, values):
+            dimensions[box[0]] = value
+        dimensions.setflags(write=False)
+
+        # Columns are length, width, height, weight
+        self.dimensions = dimensions
+        self.codes = np.array([box[0] for box in boxData], dtype=np.int32)
+
+        # Plain tuples for the scalar lookups in the decoder loop
+        self.rows = [tuple(row) for row in dimensions.tolist()]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def getShape(self, code, orientation):
+        # Orientation 1 swaps length and width
+        length, width, height, _ = self.rows[code]
+        if orientation == 1:
+            return width, length, height
+        return length, width, height
+
+    def getWeight(self, code):
+        return self.rows[code][3]
+
+
+class Genome:
+    # Packing order as a permutation of box codes plus one orientation byte
+    # per position
+    __slots__ = ('codes', 'orientations')
+
+    def __init__(self, codes, orientations):
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.orientations = np.asarray(orientations, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def genes(self):
+        return zip(self.codes.tolist(), self.orientations.tolist())
+
+    def key(self):
+        # Digest of the whole gene sequence, used to recognise repeats
+        return hashlib.blake2b(self.codes.tobytes() + self.orientations.tobytes(), digest_size=16).digest()
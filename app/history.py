@@ -0,0 +1,116 @@
+import numpy as np
+import ranking
+
+HISTORY_MODES = {'ring', 'downsample'}
+
+# Objective columns and which end of each one is best
+OBJECTIVES = [('volume', 'max'), ('weight', 'min'), ('center_of_mass', 'min')]
+COLUMNS = ['generation', 'front_size', 'hypervolume', 'churn'] + \
+    ['{}_{}'.format(objective, stat) for objective, _ in OBJECTIVES
+     for stat in ('best', 'mean', 'min')]
+
+
+class ObjectiveHistory:
+    # Per generation statistics of a run's front 0 in one preallocated
+    # (capacity, columns) array. When it is full, 'ring' overwrites the
+    # oldest generation and 'downsample' drops every other row and from then
+    # on records every second generation only, so any run fits in
+    # `capacity`. The row of the last recorded generation is kept aside
+    # either way, for progress updates.
+    def __init__(self, capacity=4096, mode='downsample'):
+        if mode not in HISTORY_MODES:
+            raise ValueError("mode must be one of {}".format(
+                sorted(HISTORY_MODES)))
+        self.capacity = max(2, capacity)
+        self.mode = mode
+        self.data = np.full((self.capacity, len(COLUMNS)), np.nan)
+        self.count = 0
+        self.start = 0
+        self.stride = 1
+        self.first = None
+        self.newest = None
+        self.index = {name: column for column, name in enumerate(COLUMNS)}
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def record(self, generation, population, convergence=None):
+        self.newest = self.__row(generation, population, convergence)
+        if self.first is None:
+            self.first = generation
+        if (generation - self.first) % self.stride != 0:
+            return False
+
+        if self.mode == 'ring':
+            position = (self.start + self.count) % self.capacity
+            if self.count >= self.capacity:
+                # Overwrite the oldest generation
+                position = self.start
+                self.start = (self.start + 1) % self.capacity
+        else:
+            if self.count >= self.capacity:
+                kept = self.data[::2].copy()
+                self.data[:len(kept)] = kept
+                self.data[len(kept):] = np.nan
+                self.count = len(kept)
+                self.stride *= 2
+                if (generation - self.first) % self.stride != 0:
+                    return False
+            position = self.count
+
+        self.data[position] = self.newest
+        self.count = min(self.count + 1, self.capacity)
+        return True
+
+    def __row(self, generation, population, convergence):
+        # Front 0 is what serial and island runs both have, an island run
+        # only sees the fronts of its islands
+        front = population.fronts[0] if len(population.fronts) > 0 else []
+
+        # ranking.objectiveMatrix is [-volume, weight, center of mass]
+        objectives = ranking.objectiveMatrix(front)
+        objectives[:, 0] = -objectives[:, 0]
+
+        row = np.full(len(COLUMNS), np.nan)
+        row[0] = generation
+        row[1] = len(front)
+        if convergence is not None:
+            row[2] = convergence['hypervolume']
+            row[3] = convergence['churn']
+        if len(objectives) > 0:
+            for column, (_, best) in enumerate(OBJECTIVES):
+                values = objectives[:, column]
+                row[4 + 3 * column] = values.max() if best == 'max' else values.min()
+                row[5 + 3 * column] = values.mean()
+                row[6 + 3 * column] = values.min()
+        return row
+
+    def table(self):
+        # Rows oldest first
+        if self.mode == 'ring' and self.start > 0:
+            return np.concatenate([self.data[self.start:], self.data[:self.start]])
+        return self.data[:self.count]
+
+    def column(self, name):
+        return self.table()[:, self.index[name]]
+
+    def latest(self):
+        # Last recorded generation, even when it was not kept in the table
+        return self.__asDicts([self.newest])[0] if self.newest is not None else None
+
+    def rows(self, after=None, limit=None):
+        # Kept generations after `after` as dicts, for the progress stream
+        table = self.table()
+        if after is not None:
+            table = table[table[:, 0] > after]
+        if limit is not None:
+            table = table[-limit:]
+        return self.__asDicts(table)
+
+    def __asDicts(self, table):
+        rows = [{name: (None if np.isnan(value) else value) for name, value in zip(COLUMNS, row)}
+                for row in np.asarray(table).tolist()]
+        for row in rows:
+            row['generation'] = int(row['generation'])
+            row['front_size'] = int(row['front_size'])
+        return rows
@@ -1,18 +1,18 @@
 import math
+import numpy as np
+from spatial import PlacementIndex, CandidatePoints
 
 
 class Individual:
-    def __init__(self, boxes, gridX, gridY, gridZ):
+    def __init__(self, genome, boxTable, gridX, gridY, gridZ, decoded=None, prefixCache=None):
         self.gridX = gridX
         self.gridY = gridY
         self.gridZ = gridZ
-        self.boxes = boxes
-        self.insertedBoxes = []
+        self.genome = genome
+        self.boxTable = boxTable
         self.maxHeight = 0
         self.rank = None
         self.crowdingDistance = None
-        self.dominationCount = None
-        self.dominatedSolutions = None
         self.objectives = {
             'weight': 0,
             'volume': 0,
@@ -20,20 +20,76 @@ class Individual:
         }
         self.fitness = 0
 
-        # Position set
-        self.positionSet = [(0, 0, 0)]
+        # Placements: genome index and position of every inserted box
+        self.insertedIndices = []
+        self.positions = []
+
+        # Decoding already done elsewhere (e.g. by a worker process)
+        if decoded is not None:
+            self.applyDecoded(*decoded)
+            return
 
-        for box in self.boxes:
-            self.insertBox(box)
+        # Position set
+        self.positionSet = CandidatePoints(gridX, gridY, gridZ)
+        self.placementIndex = PlacementIndex(
+            PlacementIndex.cellSizeFor(boxTable.dimensions[boxTable.codes, :3].tolist()))
+
+        # Resume from the longest packed prefix seen before, if any
+        start = 0
+        prefixKeys = {}
+        if prefixCache is not None:
+            prefixKeys = prefixCache.prefixKeys(genome)
+            start, snapshot = prefixCache.longest(prefixKeys)
+            if snapshot is not None:
+                self.restoreSnapshot(*snapshot)
+
+        genes = list(genome.genes())
+        for index in range(start, len(genes)):
+            if index > start and index in prefixKeys:
+                prefixCache.put(prefixKeys[index], self.positionSet,
+                                self.insertedIndices, self.positions, self.maxHeight)
+            self.insertBox(index, boxTable.getShape(*genes[index]))
 
         self.calculateFitness()
 
-    def isValidInsert(self, box, pos):
+        # Packing state is only needed while decoding
+        self.positionSet = None
+        self.placementIndex = None
+        self.insertedIndices = np.array(self.insertedIndices, dtype=np.int32)
+        self.positions = np.array(self.positions).reshape(-1, 3)
+
+    def restoreSnapshot(self, positionSet, insertedIndices, positions, maxHeight):
+        self.positionSet = CandidatePoints(self.gridX, self.gridY, self.gridZ,
+                                           [tuple(position) for position in positionSet.tolist()])
+        self.insertedIndices = insertedIndices.tolist()
+        self.positions = [tuple(position) for position in positions.tolist()]
+        self.maxHeight = maxHeight
+
+        codes = self.genome.codes.tolist()
+        orientations = self.genome.orientations.tolist()
+        for index, (posX, posY, posZ) in zip(self.insertedIndices, self.positions):
+            length, width, height = self.boxTable.getShape(
+                codes[index], orientations[index])
+            self.placementIndex.add(posX, posX + length, posY,
+                                    posY + width, posZ, posZ + height)
+
+    def getDecoded(self):
+        # Compact decode result: inserted genome indices, their positions,
+        # max height and objectives
+        return self.insertedIndices, self.positions, self.maxHeight, dict(self.objectives)
+
+    def applyDecoded(self, insertedIndices, positions, maxHeight, objectives):
+        self.insertedIndices = insertedIndices
+        self.positions = positions
+        self.maxHeight = maxHeight
+        self.objectives = dict(objectives)
+
+    def isValidInsert(self, shape, pos):
         # Initialize variable for non hanging area
         nonHangingArea = 0
 
         # Loop for each inserted box check if overlapping
-        length, width, height = box.getShape()
+        length, width, height = shape
 
         x1min = pos[0]
         x1max = x1min + length
@@ -46,21 +102,14 @@ class Individual:
         if x1max > self.gridX or y1max > self.gridY or z1max > self.gridZ:
             return False
 
-        for bx in self.insertedBoxes:
-            length, width, height = bx.getShape()
-            x2min = bx.posX
-            x2max = x2min + length
-            y2min = bx.posY
-            y2max = y2min + width
-            z2min = bx.posZ
-            z2max = z2min + height
-
+        # Only boxes near the candidate can intersect or support it
+        for x2min, x2max, y2min, y2max, z2min, z2max in self.placementIndex.overlapping(x1min, x1max, y1min, y1max, z1min, z1max):
             # Check if intersect
-            if x1min + 0.5 < x2max and x2min < x1max - 0.5 and y1min + 0.5 < y2max and y2min < y1max - 0.5 and z1min + 0.5 < z2max and z2min < z1max - 0.5:
+            if z1min + 0.5 < z2max and z2min < z1max - 0.5:
                 return False
 
             # Get intersect area
-            if z1min == z2max and x1min + 0.5 < x2max and x2min < x1max - 0.5 and y1min + 0.5 < y2max and y2min < y1max - 0.5:
+            if z1min == z2max:
                 xImin = max(x1min, x2min)
                 yImin = max(y1min, y2min)
                 xImax = min(x1max, x2max)
@@ -70,28 +119,32 @@ class Individual:
 
         return z1min == 0 or nonHangingArea == (x1max - x1min) * (y1max - y1min)
 
-    def insertBox(self, box):
-        # Get final box length, width, and height
-        # consider orientation
-        length, width, height = box.getShape()
+    def insertBox(self, index, shape):
+        # Final box length, width, and height
+        # after orientation
+        length, width, height = shape
 
-        for i in range(len(self.positionSet)):
-            if self.isValidInsert(box, self.positionSet[i]):
-                box.setPosition(*self.positionSet[i])
+        for position in self.positionSet:
+            if self.isValidInsert(shape, position):
+                posX, posY, posZ = position
 
-                self.positionSet.pop(i)
+                self.positionSet.remove(position)
+                self.positionSet.removeInside(posX, posX + length, posY,
+                                              posY + width, posZ, posZ + height)
 
-                self.positionSet += [(box.posX + length, box.posY, box.posZ),
-                                     (box.posX, box.posY + width, box.posZ),
-                                     (box.posX, box.posY, box.posZ + height)]
-                self.positionSet = sorted(
-                    self.positionSet, key=lambda x: (x[2], x[1], x[0]))
+                self.insertedIndices.append(index)
+                self.positions.append((posX, posY, posZ))
+                self.placementIndex.add(posX, posX + length, posY,
+                                        posY + width, posZ, posZ + height)
 
-                self.insertedBoxes.append(box)
+                for point in [(posX + length, posY, posZ),
+                              (posX, posY + width, posZ),
+                              (posX, posY, posZ + height)]:
+                    self.positionSet.add(point, self.placementIndex)
 
                 # Calculate max height for fitness calculation
                 self.maxHeight = max(
-                    self.maxHeight, box.posZ + height)
+                    self.maxHeight, posZ + height)
 
                 return
 
@@ -100,16 +153,21 @@ class Individual:
         sumY = 0
         sumZ = 0
         sumWeight = 0
-        for box in self.insertedBoxes:
+        codes = self.genome.codes.tolist()
+        orientations = self.genome.orientations.tolist()
+        for index, (posX, posY, posZ) in zip(self.insertedIndices, self.positions):
             # Calculate fitness weight and volume
-            length, width, height = box.getShape()
-            self.objectives['weight'] += box.weight
+            code = codes[index]
+            length, width, height = self.boxTable.getShape(
+                code, orientations[index])
+            weight = self.boxTable.getWeight(code)
+            self.objectives['weight'] += weight
             self.objectives['volume'] += length * width * height
 
-            sumX += (box.posX + length / 2.0) * box.weight
-            sumY += (box.posY + width / 2.0) * box.weight
-            sumZ += (box.posZ + height / 2.0) * box.weight
-            sumWeight += box.weight
+            sumX += (posX + length / 2.0) * weight
+            sumY += (posY + width / 2.0) * weight
+            sumZ += (posZ + height / 2.0) * weight
+            sumWeight += weight
 
         # Prevent division by 0
         sumWeight = 1 if sumWeight == 0 else sumWeight
@@ -0,0 +1,111 @@
+import io
+import time
+import pstats
+import cProfile
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+class Instrumentation:
+    # Named stage timers and counters for one run, totals plus a window of
+    # per generation timings, with optional cProfile capture of the run
+    def __init__(self, profile=False, maxGenerations=1000):
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.generations = deque(maxlen=maxGenerations)
+        self.current = None
+        self.profiler = cProfile.Profile() if profile else None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.totals[name] += elapsed
+            self.calls[name] += 1
+            if self.current is not None:
+                self.current[name] = self.current.get(name, 0) + elapsed
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def merge(self, summary):
+        # Fold in the summary of a run in another process
+        for name, stage in summary['stages'].items():
+            self.totals[name] += stage['total']
+            self.calls[name] += stage['calls']
+        for name, value in summary['counters'].items():
+            self.counters[name] += value
+
+    def beginGeneration(self, generation):
+        self.current = {'generation': generation}
+
+    def endGeneration(self):
+        if self.current is not None:
+            self.generations.append(self.current)
+        self.current = None
+
+    def startProfile(self):
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stopProfile(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+
+    def profileReport(self, limit=30):
+        if self.profiler is None:
+            return None
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats(
+            'cumulative').print_stats(limit)
+        return stream.getvalue()
+
+    def summary(self, includeGenerations=False):
+        result = {
+            'stages': {name: {'total': total, 'calls': self.calls[name], 'mean': total / self.calls[name]}
+                       for name, total in self.totals.items()},
+            'counters': dict(self.counters)
+        }
+        if includeGenerations:
+            result['generations'] = list(self.generations)
+        if self.profiler is not None:
+            result['profile'] = self.profileReport()
+        return result
+
+
+class MetricsRegistry:
+    # Aggregates run summaries from finished jobs for the /metrics route
+    def __init__(self):
+        self.stageSeconds = defaultdict(float)
+        self.stageCalls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.jobs = defaultdict(int)
+
+    def record(self, status, summary=None):
+        self.jobs[status] += 1
+        if summary is None:
+            return
+        for name, stage in summary['stages'].items():
+            self.stageSeconds[name] += stage['total']
+            self.stageCalls[name] += stage['calls']
+        for name, value in summary['counters'].items():
+            self.counters[name] += value
+
+    def toPrometheus(self):
+        lines = ['# TYPE ga_jobs_total counter']
+        lines += ['ga_jobs_total{{status="{}"}} {}'.format(status, count)
+                  for status, count in sorted(self.jobs.items())]
+        lines.append('# TYPE ga_stage_seconds_total counter')
+        lines += ['ga_stage_seconds_total{{stage="{}"}} {}'.format(name, value)
+                  for name, value in sorted(self.stageSeconds.items())]
+        lines.append('# TYPE ga_stage_calls_total counter')
+        lines += ['ga_stage_calls_total{{stage="{}"}} {}'.format(name, value)
+                  for name, value in sorted(self.stageCalls.items())]
+        lines.append('# TYPE ga_counter_total counter')
+        lines += ['ga_counter_total{{name="{}"}} {}'.format(name, value)
+                  for name, value in sorted(self.counters.items())]
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,126 @@
+import random
+import multiprocessing
+from genome import Genome
+from individual import Individual
+from population import Population
+from progress import NullEmitter
+
+
+def packIndividuals(individuals):
+    # Genome arrays plus decode results, enough to rebuild the individuals
+    # in another process without decoding them again
+    return [(individual.genome.codes, individual.genome.orientations, individual.getDecoded())
+            for individual in individuals]
+
+
+def unpackIndividuals(packed, boxTable, gridX, gridY, gridZ):
+    return [Individual(Genome(codes, orientations), boxTable, gridX, gridY, gridZ, decoded=decoded)
+            for codes, orientations, decoded in packed]
+
+
+def runIsland(connection, packed, boxTable, gridX, gridY, gridZ, seed, options):
+    # Imported here, ga imports this module
+    from ga import GeneticAlgorithm
+
+    population = Population()
+    population.extend(unpackIndividuals(
+        packed, boxTable, gridX, gridY, gridZ))
+    GA = GeneticAlgorithm(population, options['mutationProbability'], 0, room_id=None,
+                          sortingBackend=options['sortingBackend'], cacheBytes=options['cacheBytes'],
+                          prefixInterval=options['prefixInterval'], prefixCacheBytes=options['prefixCacheBytes'],
+                          socket=NullEmitter(),
+                          rng=random.Random(seed))
+    children = GA.prepare()
+
+    while True:
+        command, argument = connection.recv()
+        if command == 'evolve':
+            # Immigrants compete with the children for survival
+            generations, immigrants = argument
+            children.extend(unpackIndividuals(
+                immigrants, boxTable, gridX, gridY, gridZ))
+            for _ in range(generations):
+                children = GA.step(children)
+
+            front = sorted(GA.population.fronts[0],
+                           key=lambda individual: individual.crowdingDistance, reverse=True)
+            connection.send(packIndividuals(front))
+        elif command == 'collect':
+            GA.recordCacheCounters()
+            connection.send(
+                (packIndividuals(GA.population.individuals), GA.stats.summary()))
+            break
+        else:
+            break
+
+    connection.close()
+
+
+class IslandModel:
+    # Sub-populations evolving in their own processes, driven one epoch of
+    # generations at a time. Each island answers an epoch with its front 0,
+    # most spread out first, and takes the immigrants it is given into the
+    # next selection.
+    def __init__(self, population, islandCount, boxTable, gridX, gridY, gridZ, options, rng=random):
+        self.boxTable = boxTable
+        self.gridX = gridX
+        self.gridY = gridY
+        self.gridZ = gridZ
+        self.connections = []
+        self.processes = []
+
+        context = multiprocessing.get_context('spawn')
+        try:
+            for island in range(islandCount):
+                connection, remote = context.Pipe()
+                self.connections.append(connection)
+                process = context.Process(target=runIsland, args=(
+                    remote, packIndividuals(population.individuals[island::islandCount]),
+                    boxTable, gridX, gridY, gridZ, rng.getrandbits(64), options), daemon=True)
+                process.start()
+                remote.close()
+                self.processes.append(process)
+        except BaseException:
+            # Stop the islands started so far
+            self.close()
+            raise
+
+    def __len__(self):
+        return len(self.processes)
+
+    def evolve(self, generations, immigrants):
+        # Returns the front 0 individuals of every island
+        for connection, islandImmigrants in zip(self.connections, immigrants):
+            connection.send(
+                ('evolve', (generations, packIndividuals(islandImmigrants))))
+        return [self.__unpack(connection.recv()) for connection in self.connections]
+
+    def collect(self):
+        # Final populations of all islands and their run summaries
+        for connection in self.connections:
+            connection.send(('collect', None))
+
+        individuals = []
+        summaries = []
+        for connection in self.connections:
+            packed, summary = connection.recv()
+            individuals.extend(self.__unpack(packed))
+            summaries.append(summary)
+        return individuals, summaries
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(('stop', None))
+            except OSError:
+                pass
+            connection.close()
+        for process in self.processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        self.connections = []
+        self.processes = []
+
+    def __unpack(self, packed):
+        return unpackIndividuals(packed, self.boxTable, self.gridX, self.gridY, self.gridZ)
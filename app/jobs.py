@@ -0,0 +1,463 @@
+import os
+import uuid
+import random
+import numpy as np
+import threading
+import traceback
+import multiprocessing
+from collections import deque, OrderedDict
+from progress import getEmitter
+from instrumentation import MetricsRegistry
+from checkpoint import checkpointPath
+from results import ResultStore, isIdentifier
+from reports import ReportRenderer, REPORT_FORMATS
+
+
+class JobRejected(Exception):
+    pass
+
+
+def runJob(jobId, data, roomId, cancelEvent, socket=None, resultConnection=None):
+    # Worker processes publish through the message queue, like the server
+    if socket is None:
+        socket = getEmitter()
+    results = ResultStore()
+
+    # Jobs of a batch say which problem they are
+    batch = {key: data[key]
+             for key in ('batch_id', 'batch_index') if key in data}
+
+    def emit(status, **payload):
+        socket.emit("status", dict(
+            status=status, job_id=jobId, **batch, **payload), room=roomId)
+
+    # Nothing counts as a cancellation before ga is imported
+    cancelled = ()
+    try:
+        # Imported here so the server process does not pay for them until a
+        # job actually runs in it (local mode), a failing import is reported
+        # like any other error of the job
+        import data_gen
+        from ga import GeneticAlgorithm, RunCancelled
+        from tester import Tester, placementOf
+        from transport import encodeFront, encodeResult, saveResult
+        from seeding import Seeding, SeedStore, fingerprint
+        from prefix_cache import PrefixCache, DEFAULT_BYTES
+        cancelled = RunCancelled
+
+        options = dict(profile=data['profile'] if 'profile' in data else False,
+                       workers=data['workers'] if 'workers' in data else 0,
+                       socket=socket, cancelEvent=cancelEvent, jobId=jobId,
+                       progressInterval=data['progress_interval'] if 'progress_interval' in data else 0.5,
+                       progressStride=data['progress_stride'] if 'progress_stride' in data else 1,
+                       islands=data['islands'] if 'islands' in data else 1,
+                       migrationInterval=data['migration_interval'] if 'migration_interval' in data else 10,
+                       migrants=data['migrants'] if 'migrants' in data else 2,
+                       patience=data['patience'] if 'patience' in data else 0,
+                       timeBudget=data['time_budget'] if 'time_budget' in data else 0,
+                       targetHypervolume=data['target_hypervolume'] if 'target_hypervolume' in data else None,
+                       historySize=data['history_size'] if 'history_size' in data else 4096,
+                       historyMode=data['history_mode'] if 'history_mode' in data else 'downsample',
+                       prefixInterval=data['prefix_interval'] if 'prefix_interval' in data else 0,
+                       prefixCacheBytes=int(data['prefix_cache_mb'] * 1024 * 1024) if 'prefix_cache_mb' in data else DEFAULT_BYTES)
+
+        # Report charts go back to the job manager with the result and are
+        # rendered there, after this job gave up its worker slot
+        reports = None
+        if 'reports' in data and data['reports']:
+            reports = dict(dpi=data['report_dpi'] if 'report_dpi' in data else 200,
+                           format=data['report_format'] if 'report_format' in data else 'jpg')
+            if reports['format'] not in REPORT_FORMATS:
+                raise ValueError("report_format must be one of {}".format(
+                    sorted(REPORT_FORMATS)))
+
+        # A seeded job draws from its own stream instead of the global random
+        rng = random.Random(data['seed']) if 'seed' in data else None
+        options['rng'] = rng
+        if 'checkpoint_interval' in data:
+            options['checkpointPath'] = checkpointPath(jobId)
+            options['checkpointInterval'] = data['checkpoint_interval']
+
+        # Warm start from heuristics and fronts of earlier runs on this box set
+        seeding = None
+        if 'warm_start' in data and data['warm_start']:
+            seeding = Seeding(storedFraction=data['stored_fraction'] if 'stored_fraction' in data else 0.5,
+                              store=SeedStore())
+
+        if 'resume' in data and data['resume']:
+            # Same job id, so the run keeps writing to its checkpoint
+            GA = GeneticAlgorithm.fromCheckpoint(checkpointPath(jobId), roomId,
+                                                 maxGeneration=data['max_generation'] if 'max_generation' in data else None,
+                                                 **options)
+        else:
+            # Decoded through the run's prefix cache, if it has one, so the
+            # first children resume from their parents' snapshots
+            prefixCache = PrefixCache(options['prefixInterval'], options['prefixCacheBytes']) \
+                if options['prefixInterval'] > 0 else None
+            population = data_gen.loadData(
+                data['boxes'], data['grid_x'], data['grid_y'], data['grid_z'], data['population_size'], seeding=seeding, rng=rng,
+                prefixCache=prefixCache)
+            GA = GeneticAlgorithm(population, data['mutation_probability'], data['max_generation'], room_id=roomId,
+                                  prefixCache=prefixCache, **options)
+
+        emit("ga-begin")
+        GA.start()
+        emit("ga-end", generations=GA.generation,
+             stop_reason=GA.stopReason, hypervolume=GA.convergence.bestHypervolume)
+
+        if seeding is not None:
+            seeding.store.save(fingerprint(GA.evaluator.boxTable), [
+                individual.genome for individual in GA.finalPopulation.fronts[0]])
+
+        Test = Tester(GA, show=False, save=True,
+                      savePath='static', room_id=roomId)
+
+        # Compact placements by default, the client draws them itself or asks
+        # for the figure later. Criteria with the same winner share it.
+        # transport='binary' sends packed arrays as binary attachments and
+        # 'url' stores them under static, both with the front's objectives.
+        transport = data['transport'] if 'transport' in data else 'json'
+        criteriaList = ["fitness", "center_of_mass", "volume", "weight"]
+        best = Test.getBestIndividuals(criteriaList)
+        if transport == 'binary':
+            emit("front", result=encodeFront(GA.finalPopulation.fronts[0]))
+        elif transport == 'url':
+            emit("front", url=saveResult(jobId, 'front', encodeFront(
+                GA.finalPopulation.fronts[0])))
+
+        placements = {}
+        encoded = {}
+        for criteria in criteriaList:
+            if cancelEvent.is_set():
+                raise RunCancelled()
+            emit("generate-best-{}-begin".format(criteria))
+            individual = best[criteria]
+            key = individual.genome.key().hex()
+            if key not in placements:
+                with GA.stats.stage('render_placement'):
+                    placements[key] = placementOf(individual)
+                    results.savePlacement(jobId, placements[key])
+
+            if transport == 'json':
+                payload = dict(placement=placements[key])
+            else:
+                if key not in encoded:
+                    with GA.stats.stage('render_encode'):
+                        encoded[key] = encodeResult(placements[key])
+                        if transport == 'url':
+                            encoded[key] = saveResult(
+                                jobId, key, encoded[key])
+                payload = dict(result=encoded[key]) if transport == 'binary' else dict(
+                    url=encoded[key])
+                payload['individual'] = key
+            if 'render' in data and data['render'] == 'figure':
+                payload['graph'] = Test.getFigure(individual)
+            emit("generate-best-{}-end".format(criteria), **payload)
+
+        stats = GA.stats.summary(
+            includeGenerations=data['profile'] if 'profile' in data else False)
+        emit("done", stats=stats)
+        if reports is not None:
+            reports['charts'] = Test.reportCharts()
+        status = "done"
+    except cancelled:
+        emit("cancelled")
+        status, stats, reports = "cancelled", None, None
+    except Exception as e:
+        traceback.print_exc()
+        emit("error", error=str(e))
+        status, stats, reports = "failed", None, None
+
+    # Hand the run summary back to the job manager for /metrics, with the
+    # report charts to render
+    if resultConnection is not None:
+        resultConnection.send((status, stats, reports))
+        resultConnection.close()
+
+
+class Job:
+    def __init__(self, jobId, data, roomId, owner, cancelEvent, group=None):
+        self.id = jobId
+        self.data = data
+        self.roomId = roomId
+        self.owner = owner
+        self.cancelEvent = cancelEvent
+        # Jobs of one request share a group, groups take turns in the queue
+        self.group = group if group is not None else jobId
+        self.status = "queued"
+        self.runner = None
+        self.resultConnection = None
+
+
+class Batch:
+    def __init__(self, batchId, jobIds, roomId, seed):
+        self.id = batchId
+        self.jobIds = jobIds
+        self.roomId = roomId
+        self.seed = seed
+        self.finished = 0
+
+
+def batchSeeds(count, seed=None):
+    # Independent per job streams spawned from one batch seed, so every
+    # problem of a batch is reproducible on its own
+    sequence = np.random.SeedSequence(seed)
+    return sequence.entropy, [int(child.generate_state(1, np.uint64)[0]) for child in sequence.spawn(count)]
+
+
+class JobManager:
+    # Runs GA jobs outside the Socket.IO handlers. Jobs wait in a bounded
+    # queue and at most `workers` of them run at once, each in its own
+    # process (non daemonic, so a job can still start its decode pool).
+    # Queued requests take turns, a batch of many problems interleaves with
+    # other requests instead of holding the workers until it is done.
+    # maxQueued bounds the queued requests, a batch counting once, and
+    # maxQueuedJobs the jobs they hold between them. Decode workers and
+    # islands are processes too, a job may ask for its share of the CPUs.
+    # With local=True jobs run in threads of this process and emit through
+    # the given socket, which is enough for tests and development.
+    def __init__(self, workers=1, maxQueued=16, local=False, socket=None, maxFinished=256, maxBatchSize=1000,
+                 reportWorkers=2, maxQueuedJobs=2048):
+        self.metrics = MetricsRegistry()
+        self.workers = max(1, workers)
+        self.cpuShare = max(1, (os.cpu_count() or 1) // self.workers)
+        self.maxQueued = maxQueued
+        self.maxQueuedJobs = maxQueuedJobs
+        self.maxFinished = maxFinished
+        self.maxBatchSize = maxBatchSize
+        self.reportWorkers = reportWorkers
+        self.renderer = None
+        self.local = local
+        self.socket = socket
+        self.context = None if local else multiprocessing.get_context('spawn')
+        self.jobs = OrderedDict()
+        # Pending jobs by group, in turn order
+        self.pending = OrderedDict()
+        self.running = {}
+        self.batches = {}
+        self.lock = threading.Condition()
+
+        self.dispatcher = threading.Thread(target=self.__dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, data, roomId, owner=None, jobId=None):
+        self.__checkProcesses(data)
+        with self.lock:
+            if self.queuedRequests() >= self.maxQueued or self.queueLength() >= self.maxQueuedJobs:
+                raise JobRejected("Job queue is full, try again later")
+            if jobId in self.jobs and self.jobs[jobId].status in ("queued", "running"):
+                raise JobRejected("Job {} is still active".format(jobId))
+
+            jobId = jobId if jobId is not None else uuid.uuid4().hex
+            self.__enqueue(self.__createJob(jobId, data, roomId, owner))
+            self.lock.notify_all()
+            return jobId
+
+    def submitBatch(self, problems, settings, roomId, owner=None, seed=None):
+        # One job per (boxes, grid) problem with the shared GA settings,
+        # queued as a single request
+        if len(problems) == 0 or len(problems) > self.maxBatchSize:
+            raise JobRejected(
+                "A batch takes 1 to {} problems".format(self.maxBatchSize))
+        for problem in problems:
+            self.__checkProcesses(dict(settings, **problem))
+        seed, seeds = batchSeeds(len(problems), seed)
+
+        with self.lock:
+            # The batch is one queued request, but every problem takes a
+            # place among the queued jobs
+            if self.queuedRequests() >= self.maxQueued or \
+                    self.queueLength() + len(problems) > self.maxQueuedJobs:
+                raise JobRejected("Job queue is full, try again later")
+
+            batchId = uuid.uuid4().hex
+            jobs = []
+            for index, (problem, jobSeed) in enumerate(zip(problems, seeds)):
+                data = dict(settings)
+                data.update(problem)
+                data.update(seed=jobSeed, batch_id=batchId, batch_index=index)
+                jobs.append(self.__createJob(
+                    uuid.uuid4().hex, data, roomId, owner, group=batchId))
+            self.batches[batchId] = Batch(
+                batchId, [job.id for job in jobs], roomId, seed)
+            for job in jobs:
+                self.__enqueue(job)
+            self.lock.notify_all()
+            return batchId, [job.id for job in jobs], seed
+
+    def resume(self, jobId, data, roomId, owner=None):
+        # Continue a job from its last checkpoint, under the same job id
+        if not isIdentifier(jobId):
+            raise JobRejected("Invalid job id")
+        if not os.path.exists(checkpointPath(jobId)):
+            raise JobRejected("No checkpoint for job {}".format(jobId))
+        return self.submit(dict(data, resume=True), roomId, owner, jobId=jobId)
+
+    def cancel(self, jobId):
+        with self.lock:
+            job = self.jobs.get(jobId)
+            if job is None or job.status in ("done", "cancelled", "failed"):
+                return False
+
+            job.cancelEvent.set()
+            if job.status == "queued":
+                self.pending[job.group].remove(job)
+                if len(self.pending[job.group]) == 0:
+                    del self.pending[job.group]
+                job.status = "cancelled"
+                # It never reaches a worker, so nothing else records or
+                # announces its end
+                self.metrics.record(job.status)
+                batch = {key: job.data[key]
+                         for key in ('batch_id', 'batch_index') if key in job.data}
+                socket = self.socket if self.socket is not None else getEmitter()
+                socket.emit("status", dict(status="cancelled", job_id=job.id, **batch),
+                            room=job.roomId)
+                self.__finishBatchJob(job)
+            return True
+
+    def cancelBatch(self, batchId):
+        with self.lock:
+            batch = self.batches.get(batchId)
+            jobIds = list(batch.jobIds) if batch is not None else []
+        return [jobId for jobId in jobIds if self.cancel(jobId)]
+
+    def cancelOwnedBy(self, owner):
+        with self.lock:
+            jobIds = [job.id for job in self.jobs.values()
+                      if job.owner == owner]
+        return [jobId for jobId in jobIds if self.cancel(jobId)]
+
+    def getStatus(self, jobId):
+        with self.lock:
+            job = self.jobs.get(jobId)
+            return None if job is None else job.status
+
+    def queueLength(self):
+        with self.lock:
+            return sum(len(jobs) for jobs in self.pending.values())
+
+    def queuedRequests(self):
+        # Requests with jobs still waiting, a batch is one of them
+        with self.lock:
+            return len(self.pending)
+
+    def __checkProcesses(self, data):
+        for key in ('workers', 'islands'):
+            if key in data and (not isinstance(data[key], int) or data[key] > self.cpuShare):
+                raise JobRejected("{} must be an integer of at most {}".format(
+                    key, self.cpuShare))
+
+    def __createJob(self, jobId, data, roomId, owner, group=None):
+        cancelEvent = threading.Event() if self.local else self.context.Event()
+        job = Job(jobId, data, roomId, owner, cancelEvent, group)
+        self.jobs[jobId] = job
+        return job
+
+    def __enqueue(self, job):
+        if job.group not in self.pending:
+            self.pending[job.group] = deque()
+        self.pending[job.group].append(job)
+
+    def __nextJob(self):
+        # Round robin over the queued requests
+        group, jobs = next(iter(self.pending.items()))
+        job = jobs.popleft()
+        del self.pending[group]
+        if len(jobs) > 0:
+            self.pending[group] = jobs
+        return job
+
+    def __finishBatchJob(self, job):
+        # Stream batch progress as each of its jobs ends, called with the lock
+        batch = self.batches.get(job.group)
+        if batch is None:
+            return
+
+        batch.finished += 1
+        socket = self.socket if self.socket is not None else getEmitter()
+        socket.emit("status", dict(status="batch-progress", batch_id=batch.id, job_id=job.id,
+                                   batch_index=job.data['batch_index'], job_status=job.status,
+                                   finished=batch.finished, total=len(batch.jobIds)), room=batch.roomId)
+        if batch.finished == len(batch.jobIds):
+            socket.emit("status", dict(status="batch-done", batch_id=batch.id,
+                                       seed=str(batch.seed)), room=batch.roomId)
+            del self.batches[batch.id]
+
+    def __dispatch(self):
+        while True:
+            with self.lock:
+                while len(self.pending) == 0 or len(self.running) >= self.workers:
+                    self.lock.wait()
+                job = self.__nextJob()
+                job.status = "running"
+                self.running[job.id] = job
+
+            job.resultConnection, sender = multiprocessing.Pipe(duplex=False)
+            if self.local:
+                job.runner = threading.Thread(target=runJob, args=(
+                    job.id, job.data, job.roomId, job.cancelEvent, self.socket, sender), daemon=True)
+            else:
+                job.runner = self.context.Process(target=runJob, args=(
+                    job.id, job.data, job.roomId, job.cancelEvent, None, sender))
+            job.runner.start()
+
+            threading.Thread(target=self.__wait, args=(job,),
+                             daemon=True).start()
+
+    def __wait(self, job):
+        # Read the result before joining so a large summary cannot block
+        # the worker on a full pipe
+        result = ("failed", None, None)
+        while True:
+            if job.resultConnection.poll(1):
+                try:
+                    result = job.resultConnection.recv()
+                except EOFError:
+                    pass
+                break
+            if not job.runner.is_alive():
+                break
+        job.runner.join()
+        job.resultConnection.close()
+
+        with self.lock:
+            job.status = result[0]
+            if job.cancelEvent.is_set():
+                job.status = "cancelled"
+            self.metrics.record(job.status, result[1])
+            del self.running[job.id]
+            self.__finishBatchJob(job)
+
+            # Only remember the most recent finished jobs
+            finished = [jobId for jobId, other in self.jobs.items()
+                        if other.status in ("done", "cancelled", "failed")]
+            for jobId in finished[:max(0, len(finished) - self.maxFinished)]:
+                del self.jobs[jobId]
+            self.lock.notify_all()
+
+        if result[2] is not None and job.status == "done":
+            self.__renderReports(job, result[2])
+
+    def __renderReports(self, job, reports):
+        # One renderer for the server, started with the first report. The
+        # job's slot is already free, the URLs follow its "done" event.
+        with self.lock:
+            if self.renderer is None:
+                self.renderer = ReportRenderer(self.reportWorkers)
+
+        relative = '/'.join(['reports', job.id])
+        batch = {key: job.data[key]
+                 for key in ('batch_id', 'batch_index') if key in job.data}
+        try:
+            futures = self.renderer.submit(reports['charts'], os.path.join('static', *relative.split('/')),
+                                           dpi=reports['dpi'], format=reports['format'])
+            payload = dict(urls=['/static/{}/{}'.format(relative, os.path.basename(future.result()))
+                                 for future in futures])
+        except Exception as e:
+            traceback.print_exc()
+            payload = dict(error=str(e))
+
+        socket = self.socket if self.socket is not None else getEmitter()
+        socket.emit("status", dict(status="reports", job_id=job.id, **batch, **payload),
+                    room=job.roomId)
@@ -0,0 +1,75 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+# Memory budget of a run's snapshots, shared by the processes decoding for
+# it. Snapshots of long genomes take tens of kilobytes each.
+DEFAULT_BYTES = 64 * 1024 * 1024
+
+
+class PrefixCache:
+    # Packing state snapshots taken every `interval` genes while decoding,
+    # keyed by a digest of the genes before that point. Packing is
+    # deterministic for a given prefix, so a child sharing a prefix with an
+    # earlier genome (most PMX children, tail mutations) can resume from
+    # the longest snapshot instead of re-packing from the first box.
+    # The least recently used snapshots go once they take over maxBytes.
+    def __init__(self, interval=16, maxBytes=DEFAULT_BYTES):
+        self.interval = interval
+        self.maxBytes = maxBytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.genesSkipped = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def prefixKeys(self, genome):
+        # Digest of genome[:g] for every checkpoint position g
+        keys = {}
+        digest = hashlib.blake2b(digest_size=16)
+        for end in range(self.interval, len(genome), self.interval):
+            digest.update(genome.codes[end - self.interval:end].tobytes())
+            digest.update(
+                genome.orientations[end - self.interval:end].tobytes())
+            keys[end] = digest.copy().digest()
+        return keys
+
+    def longest(self, keys):
+        for geneIndex in sorted(keys, reverse=True):
+            snapshot = self.entries.get(keys[geneIndex])
+            if snapshot is not None:
+                self.entries.move_to_end(keys[geneIndex])
+                self.hits += 1
+                self.genesSkipped += geneIndex
+                return geneIndex, snapshot
+        self.misses += 1
+        return 0, None
+
+    def put(self, key, positionSet, insertedIndices, positions, maxHeight):
+        if key in self.entries:
+            return
+        snapshot = (np.array(list(positionSet)).reshape(-1, 3), np.array(insertedIndices, dtype=np.int32),
+                    np.array(positions).reshape(-1, 3), maxHeight)
+        size = self.sizeOf(snapshot)
+        if size > self.maxBytes:
+            return
+        self.entries[key] = snapshot
+        self.bytes += size
+        while self.bytes > self.maxBytes:
+            self.bytes -= self.sizeOf(self.entries.popitem(last=False)[1])
+
+    @staticmethod
+    def sizeOf(snapshot):
+        return sum(array.nbytes for array in snapshot[:3])
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'genes_skipped': self.genesSkipped,
+                'size': len(self.entries), 'bytes': self.bytes, 'max_bytes': self.maxBytes,
+                'interval': self.interval}
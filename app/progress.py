@@ -0,0 +1,84 @@
+import os
+import time
+from flask_socketio import SocketIO
+
+# One message queue client per process, shared by every GA run in it
+emitters = {}
+
+
+def getEmitter():
+    url = os.getenv('REDIS_URL')
+    if url not in emitters:
+        emitters[url] = SocketIO(message_queue=url,
+                                 cors_allowed_origins=os.getenv('CLIENT_ORIGIN'))
+    return emitters[url]
+
+
+class NullEmitter:
+    # Drops every event, for runs nobody listens to
+    def emit(self, *args, **kwargs):
+        pass
+
+
+class ProgressReporter:
+    # Coalesces per generation progress, an update is only emitted when at
+    # least `minInterval` seconds and `stride` generations passed since the
+    # previous one, the rest are dropped in favour of the latest state
+    def __init__(self, socket, roomId, minInterval=0.5, stride=1, jobId=None):
+        self.socket = socket
+        self.roomId = roomId
+        self.minInterval = minInterval
+        self.stride = max(1, stride)
+        self.jobId = jobId
+        self.lastGeneration = None
+        self.lastTime = None
+        self.emitted = 0
+
+    def update(self, generation, population, progress=None, force=False, history=None):
+        now = time.monotonic()
+        if not force and self.lastGeneration is not None and \
+                (generation - self.lastGeneration < self.stride or now - self.lastTime < self.minInterval):
+            return False
+
+        payload = dict(progress) if progress is not None else {}
+        payload['n'] = generation
+        if self.jobId is not None:
+            payload['job_id'] = self.jobId
+
+        # Throughput since the previous emitted update
+        if self.lastGeneration is not None and now > self.lastTime:
+            payload['generations_per_second'] = (
+                generation - self.lastGeneration) / (now - self.lastTime)
+
+        front = population.fronts[0] if len(population.fronts) > 0 else []
+        payload['front_size'] = len(front)
+        latest = history.latest() if history is not None else None
+        if latest is not None:
+            # Read from the run's objective history, which already has them
+            payload['best'] = {key: latest[key + '_best']
+                               for key in ('volume', 'weight', 'center_of_mass')}
+            payload['mean'] = {key: latest[key + '_mean']
+                               for key in ('volume', 'weight', 'center_of_mass')}
+            payload['hypervolume'] = latest['hypervolume']
+            payload['churn'] = latest['churn']
+
+            # Every kept generation since the previous update, none are lost
+            # to throttling, and the latest one even when the history
+            # thinned it out
+            rows = history.rows(after=self.lastGeneration)
+            if len(rows) == 0 or rows[-1]['generation'] != latest['generation']:
+                rows.append(latest)
+            payload['trajectory'] = [{key: row[key] for key in ('generation', 'hypervolume', 'churn', 'front_size')}
+                                     for row in rows]
+        elif len(front) > 0:
+            payload['best'] = {
+                'volume': max(i.objectives['volume'] for i in front),
+                'weight': min(i.objectives['weight'] for i in front),
+                'center_of_mass': min(i.objectives['center_of_mass'] for i in front)
+            }
+
+        self.socket.emit('ga-progress', payload, room=self.roomId)
+        self.lastGeneration = generation
+        self.lastTime = now
+        self.emitted += 1
+        return True
@@ -0,0 +1,141 @@
+import numpy as np
+
+
+def objectiveMatrix(individuals):
+    # Pack objectives in minimization form, same direction as
+    # Individual.dominates: maximize volume, minimize weight and center of mass
+    return np.array([[-i.objectives['volume'], i.objectives['weight'], i.objectives['center_of_mass']]
+                     for i in individuals], dtype=float).reshape(-1, 3)
+
+
+def dominanceMatrix(objectives, chunkSize=512):
+    # dominance[i, j] is True if individual i dominates individual j
+    individualCount = len(objectives)
+    dominance = np.empty((individualCount, individualCount), dtype=bool)
+
+    # Build in row chunks to bound the (chunk, N, 3) temporaries
+    for start in range(0, individualCount, chunkSize):
+        block = objectives[start:start + chunkSize, None, :]
+        dominance[start:start + chunkSize] = np.all(block <= objectives[None, :, :], axis=2) & \
+            np.any(block < objectives[None, :, :], axis=2)
+
+    return dominance
+
+
+def peelFronts(dominance):
+    dominationCount = dominance.sum(axis=0)
+    front = np.flatnonzero(dominationCount == 0)
+    fronts = []
+
+    while len(front) > 0:
+        fronts.append(front)
+        dominatedByFront = dominance[front]
+        dominationCount = dominationCount - dominatedByFront.sum(axis=0)
+        released = np.flatnonzero(
+            (dominationCount == 0) & dominatedByFront.any(axis=0))
+
+        # The loop version appends an individual when its last dominator in
+        # the current front is processed, keep that order
+        lastDominator = len(front) - 1 - \
+            np.argmax(dominatedByFront[::-1, released], axis=0)
+        front = released[np.lexsort((released, lastDominator))]
+
+    return [front.tolist() for front in fronts]
+
+
+def numpyNonDominatedSort(individuals):
+    return peelFronts(dominanceMatrix(objectiveMatrix(individuals)))
+
+
+def pythonNonDominatedSort(individuals):
+    dominationCount = [0] * len(individuals)
+    dominatedSolutions = [[] for _ in individuals]
+    fronts = [[]]
+
+    for p, individual in enumerate(individuals):
+        for q, otherIndividual in enumerate(individuals):
+            if individual.dominates(otherIndividual):
+                dominatedSolutions[p].append(q)
+            elif otherIndividual.dominates(individual):
+                dominationCount[p] += 1
+        if dominationCount[p] == 0:
+            fronts[0].append(p)
+
+    i = 0
+    while len(fronts[i]) > 0:
+        temp = []
+        for p in fronts[i]:
+            for q in dominatedSolutions[p]:
+                dominationCount[q] -= 1
+                if dominationCount[q] == 0:
+                    temp.append(q)
+        i = i + 1
+        fronts.append(temp)
+
+    return fronts[:-1]
+
+
+SORTING_BACKENDS = {
+    'numpy': numpyNonDominatedSort,
+    'python': pythonNonDominatedSort,
+}
+
+
+# Objectives in the order crowding distance walks them (Individual.objectives
+# insertion order), ties are broken by the order of the previous key
+CROWDING_KEYS = ['weight', 'volume', 'center_of_mass']
+
+
+def crowdingValues(individuals):
+    return np.array([[i.objectives[key] for key in CROWDING_KEYS] for i in individuals],
+                    dtype=float).reshape(-1, len(CROWDING_KEYS))
+
+
+def crowdingDistances(values, frontIds):
+    # Crowding distance of every individual in all fronts at once. values is
+    # the (N, objectives) matrix and frontIds the front of each row, rows of
+    # a front in their list order. Same results as sorting each front in
+    # place once per objective and walking it, ties included, since every
+    # sort below is stable on the order left by the previous objective.
+    distances = np.zeros(len(values))
+    if len(values) == 0:
+        return distances
+
+    order = np.argsort(frontIds, kind='stable')
+    sortedFronts = frontIds[order]
+    starts = np.flatnonzero(np.r_[True, sortedFronts[1:] != sortedFronts[:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+    segment = np.repeat(np.arange(len(starts)), ends - starts + 1)
+    interior = np.ones(len(order), dtype=bool)
+    interior[starts] = False
+    interior[ends] = False
+    interiorPositions = np.flatnonzero(interior)
+
+    for key in range(values.shape[1]):
+        order = order[np.lexsort((values[order, key], sortedFronts))]
+        sortedValues = values[order, key]
+
+        # Boundary individuals always chosen first
+        distances[order[starts]] = 10**5
+        distances[order[ends]] = 10**5
+
+        scale = sortedValues[ends] - sortedValues[starts]
+        scale[scale == 0] = 1
+
+        distances[order[interiorPositions]] += (sortedValues[interiorPositions + 1] -
+                                                sortedValues[interiorPositions - 1]) / scale[segment[interiorPositions]]
+
+    return distances
+
+
+def releaseOrder(previousFront, front):
+    # Order in which peelFronts would release `front` while processing
+    # `previousFront`: by position of the last dominator in previousFront,
+    # then by the order `front` is given in
+    previous = objectiveMatrix(previousFront)[:, None, :]
+    current = objectiveMatrix(front)[None, :, :]
+    dominance = np.all(previous <= current, axis=2) & np.any(
+        previous < current, axis=2)
+    lastDominator = len(previousFront) - 1 - \
+        np.argmax(dominance[::-1], axis=0)
+    return np.lexsort((np.arange(len(front)), lastDominator)).tolist()
@@ -0,0 +1,153 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from results import atomicWrite
+
+REPORT_FORMATS = {'jpg', 'png', 'svg', 'pdf'}
+
+# Charts are plain dicts of arrays and labels, so they can be drawn in this
+# process or shipped to a report worker
+
+
+def objectiveCharts(volumes, weights, centerOfMass, suffix="final"):
+    return [
+        {'kind': 'scatter3d', 'name': 'scatter_all_{}'.format(suffix), 'x': volumes, 'y': centerOfMass,
+         'z': weights, 'c': weights, 'xlabel': 'Volume', 'ylabel': 'Center of Mass', 'zlabel': 'Weight'},
+        {'kind': 'scatter', 'name': 'scatter_volume_centerofmass_{}'.format(suffix), 'title': 'Center of Mass & Volume Scatter Plot',
+         'x': volumes, 'y': centerOfMass, 'c': centerOfMass, 'xlabel': 'Volume', 'ylabel': 'Center of Mass'},
+        {'kind': 'scatter', 'name': 'scatter_volume_weight_{}'.format(suffix), 'title': 'Volume & Weight Scatter Plot',
+         'x': volumes, 'y': weights, 'c': weights, 'xlabel': 'Volume', 'ylabel': 'Weight'},
+        {'kind': 'scatter', 'name': 'scatter_centerofmass_weight_{}'.format(suffix), 'title': 'Center of Mass & Weight Scatter Plot',
+         'x': centerOfMass, 'y': weights, 'c': weights, 'xlabel': 'Center of Mass', 'ylabel': 'Weight'},
+        {'kind': 'boxplot', 'name': 'boxplot_volume_{}'.format(suffix),
+         'title': 'Volume', 'values': volumes},
+        {'kind': 'boxplot', 'name': 'boxplot_weight_{}'.format(suffix),
+         'title': 'Weight', 'values': weights},
+        {'kind': 'boxplot', 'name': 'boxplot_centerofmass_{}'.format(suffix),
+         'title': 'Center of Mass', 'values': centerOfMass}
+    ]
+
+
+def developmentCharts(generations, weights, centerOfMasses, volumes):
+    return [
+        {'kind': 'line', 'name': name, 'title': title, 'x': generations, 'y': values,
+         'label': 'objective development', 'xlabel': 'Generation', 'ylabel': 'Objective Value'}
+        for name, title, values in [
+            ('development_weight',
+             'Weight Objective Development on Best Individual', weights),
+            ('development_centerofmass',
+             'Center of Mass Objective Development on Best Individual', centerOfMasses),
+            ('development_volume', 'Volume Objective Development on Best Individual', volumes)]
+    ]
+
+
+# Figure and axes per chart dimension, reused for every chart saved by the
+# process instead of creating and tearing down a figure each time
+canvases = {}
+
+
+def canvasFor(kind, reuse=True):
+    import matplotlib.pyplot as plt
+
+    dimension = '3d' if kind == 'scatter3d' else '2d'
+    if not reuse or dimension not in canvases:
+        fig = plt.figure()
+        ax = fig.add_subplot(
+            111, projection='3d') if dimension == '3d' else fig.add_subplot(111)
+        if not reuse:
+            return fig, ax
+        canvases[dimension] = (fig, ax)
+    fig, ax = canvases[dimension]
+    ax.cla()
+    return fig, ax
+
+
+def drawChart(chart, ax):
+    if chart['kind'] == 'scatter3d':
+        ax.scatter(chart['x'], chart['y'], chart['z'],
+                   c=chart['c'], cmap='viridis')
+        ax.set_zlabel(chart['zlabel'])
+    elif chart['kind'] == 'scatter':
+        ax.scatter(chart['x'], chart['y'], c=chart['c'], cmap='viridis')
+    elif chart['kind'] == 'boxplot':
+        ax.boxplot(chart['values'])
+    elif chart['kind'] == 'line':
+        ax.plot(chart['x'], chart['y'], label=chart['label'])
+        ax.legend(loc='best')
+
+    if 'title' in chart:
+        ax.set_title(chart['title'])
+    if 'xlabel' in chart:
+        ax.set_xlabel(chart['xlabel'])
+    if 'ylabel' in chart:
+        ax.set_ylabel(chart['ylabel'])
+
+
+def saveChart(fig, path, dpi, format):
+    # A reader never sees a partial image
+    with atomicWrite(path) as f:
+        fig.savefig(f, dpi=dpi, format=format, bbox_inches="tight")
+
+
+def renderCharts(charts, directory=None, dpi=200, format='jpg', show=False):
+    # Draws in the calling process, returns the written paths. A shown
+    # figure is gone from pyplot once its window closes, so every chart
+    # gets its own figure then.
+    import matplotlib.pyplot as plt
+
+    paths = []
+    for chart in charts:
+        fig, ax = canvasFor(chart['kind'], reuse=not show)
+        drawChart(chart, ax)
+        if directory is not None:
+            path = os.path.join(directory, '{}.{}'.format(
+                chart['name'], format))
+            saveChart(fig, path, dpi, format)
+            paths.append(path)
+        if show:
+            plt.show()
+            plt.close(fig)
+    return paths
+
+
+def initReportWorker():
+    # Report workers never open a window
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def renderChart(chart, directory, dpi, format):
+    return renderCharts([chart], directory, dpi, format)[0]
+
+
+class ReportRenderer:
+    # Draws report charts in worker processes with the Agg backend, one
+    # task per chart so several charts render at once. Meant to live as
+    # long as its process, submit returns the futures right away and the
+    # caller does not wait for the images.
+    def __init__(self, workers=1, dpi=200, format='jpg'):
+        if format not in REPORT_FORMATS:
+            raise ValueError("format must be one of {}".format(
+                sorted(REPORT_FORMATS)))
+        self.dpi = dpi
+        self.format = format
+        self.executor = ProcessPoolExecutor(max(1, workers), mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=initReportWorker)
+
+    def submit(self, charts, directory, dpi=None, format=None):
+        format = format if format is not None else self.format
+        if format not in REPORT_FORMATS:
+            raise ValueError("format must be one of {}".format(
+                sorted(REPORT_FORMATS)))
+        os.makedirs(directory, exist_ok=True)
+        return [self.executor.submit(renderChart, chart, directory, dpi if dpi is not None else self.dpi, format)
+                for chart in charts]
+
+    def close(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,94 @@
+import os
+import json
+import string
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Process umask, read once: os.umask can only be read by setting it, which
+# races with other threads creating files
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def isIdentifier(value):
+    # Job ids and individual keys are hex digests, nothing else may reach
+    # a path
+    return isinstance(value, str) and len(value) > 0 and all(c in string.hexdigits for c in value)
+
+
+@contextmanager
+def atomicWrite(path, mode='wb'):
+    # Yields a temporary file of its own next to the target and swaps it in
+    # once written, a crash leaves either the previous file or the new one
+    # and writers of the same path never share a temporary file. It gets the
+    # mode a plain open() would give, not mkstemp's owner only 0600, so
+    # files under static stay readable by the web server.
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(
+        dir=directory if directory else '.', suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, mode) as f:
+            yield f
+            f.flush()
+            os.fchmod(f.fileno(), 0o666 & ~UMASK)
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+class ResultStore:
+    # Placements of every job's best individuals on disk, figures are only
+    # rendered when a client asks for one and the serialized ones are kept
+    # in a bounded LRU per (job, individual)
+    def __init__(self, directory=None, maxFigures=64):
+        self.directory = directory if directory is not None else os.getenv(
+            'GA_RESULT_DIR', 'results')
+        self.maxFigures = maxFigures
+        self.figures = OrderedDict()
+        self.lock = threading.Lock()
+
+    def path(self, jobId, individual):
+        if not isIdentifier(jobId) or not isIdentifier(individual):
+            raise KeyError((jobId, individual))
+        return os.path.join(self.directory, jobId, '{}.json'.format(individual))
+
+    def savePlacement(self, jobId, placement):
+        with atomicWrite(self.path(jobId, placement['individual']), 'w') as f:
+            json.dump(placement, f)
+
+    def loadPlacement(self, jobId, individual):
+        try:
+            with open(self.path(jobId, individual)) as f:
+                return json.load(f)
+        except (KeyError, OSError):
+            return None
+
+    def figure(self, jobId, individual, batched=None):
+        # Serialized Plotly figure of a stored placement, None if unknown.
+        # batched picks the single mesh drawing, by default for large loads
+        key = (jobId, individual, batched)
+        with self.lock:
+            if key in self.figures:
+                self.figures.move_to_end(key)
+                return self.figures[key]
+
+        placement = self.loadPlacement(jobId, individual)
+        if placement is None:
+            return None
+
+        # Imported here, the server only needs plotly once a figure is asked for
+        from tester import serializeFigure
+        graph = serializeFigure(placement, batched)
+
+        with self.lock:
+            self.figures[key] = graph
+            while len(self.figures) > self.maxFigures:
+                self.figures.popitem(last=False)
+        return graph
@@ -0,0 +1,108 @@
+import os
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from genome import Genome
+from checkpoint import writeCheckpoint, readCheckpoint
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+storeLock = threading.Lock()
+
+
+def fingerprint(boxTable):
+    # Identifies a box set independently of the order the boxes came in
+    order = np.argsort(boxTable.codes, kind='stable')
+    codes = boxTable.codes[order]
+    rows = np.column_stack(
+        [codes, boxTable.dimensions[codes]]).astype(np.int64)
+    return hashlib.blake2b(rows.tobytes(), digest_size=16).hexdigest()
+
+
+def heuristicGenomes(boxTable):
+    # Classic first fit orders: largest volume, heaviest, largest base and
+    # tallest first, each in both orientations
+    length, width, height, weight = boxTable.dimensions[boxTable.codes].T
+    orders = [length * width * height, weight, length * width, height]
+
+    genomes = []
+    for key in orders:
+        codes = boxTable.codes[np.argsort(-key, kind='stable')]
+        for orientation in (0, 1):
+            genomes.append(Genome(codes, np.full(
+                len(codes), orientation, dtype=np.uint8)))
+    return genomes
+
+
+class SeedStore:
+    # Front 0 genomes of earlier runs, one file per box set fingerprint
+    def __init__(self, directory=None, maxStored=64):
+        self.directory = directory if directory is not None else os.getenv(
+            'GA_SEED_DIR', 'seeds')
+        self.maxStored = maxStored
+
+    def path(self, key):
+        return os.path.join(self.directory, '{}.npz'.format(key))
+
+    def load(self, key, limit=None):
+        if not os.path.exists(self.path(key)):
+            return []
+        stored = readCheckpoint(self.path(key))
+        genomes = [Genome(codes, orientations)
+                   for codes, orientations in zip(stored['codes'], stored['orientations'])]
+        return genomes[:limit]
+
+    def save(self, key, genomes):
+        # Newest front first, older ones fill up to maxStored. Jobs on the
+        # same box set can finish together, the lock keeps one from
+        # dropping the front another just merged.
+        with self.__lock(key):
+            unique = {}
+            for genome in list(genomes) + self.load(key):
+                unique.setdefault(genome.key(), genome)
+            genomes = list(unique.values())[:self.maxStored]
+            if len(genomes) == 0:
+                return
+            writeCheckpoint(self.path(key), codes=np.array([genome.codes for genome in genomes], dtype=np.int32),
+                            orientations=np.array([genome.orientations for genome in genomes], dtype=np.uint8))
+
+    @contextmanager
+    def __lock(self, key):
+        # Across processes with an flock on a lock file next to the seeds,
+        # across threads of this process with storeLock
+        with storeLock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(key) + '.lock', 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Seeding:
+    # Warm start of an initial population: heuristic orders, then stored
+    # genomes of earlier runs on the same box set, random individuals fill
+    # the rest (see data_gen.loadData)
+    def __init__(self, heuristics=True, storedFraction=0.5, store=None):
+        self.heuristics = heuristics
+        self.storedFraction = storedFraction
+        self.store = store
+
+    def genomes(self, boxTable, populationSize):
+        seeds = heuristicGenomes(boxTable) if self.heuristics else []
+        if self.store is not None:
+            seeds += self.store.load(fingerprint(boxTable),
+                                     int(self.storedFraction * populationSize))
+
+        unique = {}
+        for genome in seeds:
+            unique.setdefault(genome.key(), genome)
+        return list(unique.values())[:populationSize]
@@ -0,0 +1,91 @@
+from sortedcontainers import SortedKeyList
+
+
+class PlacementIndex:
+    # Uniform grid over the container, every placed box is registered in each
+    # cell its extent touches so a query only visits boxes near the candidate
+    def __init__(self, cellSize):
+        self.cellSize = cellSize
+        self.cells = {}
+        self.extents = []
+
+    @staticmethod
+    def cellSizeFor(shapes):
+        # Average box side keeps each box in a handful of cells
+        if len(shapes) == 0:
+            return 1
+        return max(1, sum(max(shape) for shape in shapes) / len(shapes))
+
+    def __cellRange(self, minValue, maxValue):
+        return range(int(minValue // self.cellSize), int(maxValue // self.cellSize) + 1)
+
+    def add(self, xmin, xmax, ymin, ymax, zmin, zmax):
+        index = len(self.extents)
+        self.extents.append((xmin, xmax, ymin, ymax, zmin, zmax))
+        for cx in self.__cellRange(xmin, xmax):
+            for cy in self.__cellRange(ymin, ymax):
+                for cz in self.__cellRange(zmin, zmax):
+                    self.cells.setdefault((cx, cy, cz), []).append(index)
+
+    def contains(self, x, y, z):
+        # True if the point is inside a placed box, so any box put there
+        # would intersect it
+        for index in self.cells.get((int(x // self.cellSize), int(y // self.cellSize), int(z // self.cellSize)), ()):
+            extent = self.extents[index]
+            if extent[0] <= x < extent[1] - 0.5 and extent[2] <= y < extent[3] - 0.5 and extent[4] <= z < extent[5] - 0.5:
+                return True
+        return False
+
+    def overlapping(self, xmin, xmax, ymin, ymax, zmin, zmax):
+        # Extents of placed boxes whose footprint overlaps the given one,
+        # using the same 0.5 tolerance as Individual.isValidInsert, and whose
+        # height range reaches [zmin, zmax] (touching counts, for support)
+        seen = set()
+        result = []
+        for cx in self.__cellRange(xmin, xmax):
+            for cy in self.__cellRange(ymin, ymax):
+                for cz in self.__cellRange(zmin, zmax):
+                    for index in self.cells.get((cx, cy, cz), ()):
+                        if index in seen:
+                            continue
+                        seen.add(index)
+                        extent = self.extents[index]
+                        if xmin + 0.5 < extent[1] and extent[0] < xmax - 0.5 and ymin + 0.5 < extent[3] and extent[2] < ymax - 0.5 \
+                                and zmin <= extent[5] and extent[4] <= zmax:
+                            result.append(extent)
+        return result
+
+
+class CandidatePoints:
+    # Extreme points a box may be placed at, kept sorted in (z, y, x) order.
+    # Points outside the container or inside a placed box can never take a
+    # box, so they are dropped instead of being probed again and again.
+    def __init__(self, gridX, gridY, gridZ, points=((0, 0, 0),)):
+        self.gridX = gridX
+        self.gridY = gridY
+        self.gridZ = gridZ
+        self.points = SortedKeyList(
+            points, key=lambda point: (point[2], point[1], point[0]))
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        return iter(self.points)
+
+    def add(self, point, placementIndex):
+        if point[0] >= self.gridX or point[1] >= self.gridY or point[2] >= self.gridZ:
+            return
+        if point in self.points or placementIndex.contains(*point):
+            return
+        self.points.add(point)
+
+    def remove(self, point):
+        self.points.remove(point)
+
+    def removeInside(self, xmin, xmax, ymin, ymax, zmin, zmax):
+        # Drop points covered by a newly placed box
+        covered = [point for point in self.points.irange_key((zmin,), (zmax - 0.5,), inclusive=(True, False))
+                   if xmin <= point[0] < xmax - 0.5 and ymin <= point[1] < ymax - 0.5]
+        for point in covered:
+            self.points.remove(point)
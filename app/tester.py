@@ -1,7 +1,5 @@
 import random
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
 import matplotlib as mpl
 import csv
 import os
@@ -9,67 +7,144 @@ import plotly
 import plotly.graph_objects as go
 import json
 from tabulate import tabulate
-from scipy import stats
-from mpl_toolkits.mplot3d import Axes3D
+from analysis import ObjectiveAnalysis
+from reports import objectiveCharts, developmentCharts, renderCharts
 
 mpl.rcParams['figure.dpi'] = 200
 color_hash_map = ["#%06x" % random.randint(0, 0xFFFFFF) for i in range(500)]
 
 
-def showGraphPlotly(individual, show=True):
+def placementOf(individual):
+    # Compact placement of an individual, what a client needs to draw it:
+    # the code of every inserted box and a flat run of
+    # [x, y, z, length, width, height] per box
+    inserted = individual.insertedIndices
+    codes = individual.genome.codes[inserted]
+    shapes = individual.boxTable.dimensions[codes, :3].copy()
+    rotated = individual.genome.orientations[inserted] == 1
+    shapes[rotated] = shapes[rotated][:, [1, 0, 2]]
+
+    return {
+        'individual': individual.genome.key().hex(),
+        'grid': [individual.gridX, individual.gridY, individual.gridZ],
+        'objectives': dict(individual.objectives),
+        'codes': codes.tolist(),
+        'placements': np.column_stack([np.asarray(individual.positions).reshape(-1, 3), shapes]).ravel().tolist()
+    }
+
+
+def boxTraces(placement):
+    # One mesh and one marker trace per box
     data = []
 
-    for box in individual.insertedBoxes:
-        length, width, height = box.getShape()
+    placements = placement['placements']
+    for n, code in enumerate(placement['codes']):
+        posX, posY, posZ, length, width, height = placements[6 * n:6 * n + 6]
         data.append(go.Mesh3d(
-            x=[box.posX, box.posX, box.posX + length, box.posX + length,
-                box.posX, box.posX, box.posX + length, box.posX + length],
-            y=[box.posY, box.posY + width, box.posY + width, box.posY,
-                box.posY, box.posY + width, box.posY + width, box.posY],
-            z=[box.posZ, box.posZ, box.posZ, box.posZ, box.posZ + height,
-                box.posZ + height, box.posZ + height, box.posZ + height],
-            color=color_hash_map[box.code],
+            x=[posX, posX, posX + length, posX + length,
+                posX, posX, posX + length, posX + length],
+            y=[posY, posY + width, posY + width, posY,
+                posY, posY + width, posY + width, posY],
+            z=[posZ, posZ, posZ, posZ, posZ + height,
+                posZ + height, posZ + height, posZ + height],
+            color=color_hash_map[code],
             i=[7, 0, 0, 0, 4, 4, 6, 6, 4, 0, 3, 2],
             j=[3, 4, 1, 2, 5, 6, 5, 2, 0, 1, 6, 3],
             k=[0, 7, 2, 3, 6, 7, 1, 1, 5, 5, 7, 6],
             showscale=True,
-            name='Box ' + str(box.code) + '  pos' + str((box.posX,
-                                                         box.posY, box.posZ)) + ' size' + str(box.getShape())
+            name='Box ' + str(code) + '  pos' + str((posX,
+                                                     posY, posZ)) + ' size' + str((length, width, height))
         ))
         data.append(go.Scatter3d(
-            x=[box.posX + length / 2],
-            y=[box.posY + width / 2],
-            z=[box.posZ + height / 2],
+            x=[posX + length / 2],
+            y=[posY + width / 2],
+            z=[posZ + height / 2],
             mode="markers",
             marker=dict(
                 size=5,
-                color=color_hash_map[box.code]
+                color=color_hash_map[code]
             ),
-            name='Box ' + str(box.code) + '  pos' + str((box.posX,
-                                                         box.posY, box.posZ)) + ' size' + str(box.getShape())
+            name='Box ' + str(code) + '  pos' + str((posX,
+                                                     posY, posZ)) + ' size' + str((length, width, height))
         ))
 
-    fig = go.Figure(data)
+    return data
+
+
+# Corners of a unit box in the vertex order of boxTraces, and its triangles
+BOX_CORNERS = np.array([[0, 0, 0], [0, 1, 0], [1, 1, 0], [1, 0, 0],
+                        [0, 0, 1], [0, 1, 1], [1, 1, 1], [1, 0, 1]])
+BOX_FACES = np.array([[7, 0, 0, 0, 4, 4, 6, 6, 4, 0, 3, 2],
+                      [3, 4, 1, 2, 5, 6, 5, 2, 0, 1, 6, 3],
+                      [0, 7, 2, 3, 6, 7, 1, 1, 5, 5, 7, 6]])
+
+
+def batchedTraces(placement):
+    # Every box in a single mesh plus one marker trace for the centers, so
+    # the figure size grows linearly with the box count. Hover details of
+    # each box ride along as customdata of its center marker.
+    codes = np.asarray(placement['codes'], dtype=int)
+    boxes = np.asarray(placement['placements']).reshape(-1, 6)
+    positions, shapes = boxes[:, :3], boxes[:, 3:]
+    colors = np.array([color_hash_map[code] for code in codes.tolist()])
+    details = np.column_stack([codes, boxes])
+    hovertemplate = 'Box %{customdata[0]}  pos(%{customdata[1]}, %{customdata[2]}, %{customdata[3]})' + \
+        ' size(%{customdata[4]}, %{customdata[5]}, %{customdata[6]})<extra></extra>'
+
+    vertices = (positions[:, None, :] + BOX_CORNERS[None, :, :]
+                * shapes[:, None, :]).reshape(-1, 3)
+    faces = (BOX_FACES[:, None, :] + 8 *
+             np.arange(len(codes))[None, :, None]).reshape(3, -1)
+
+    return [
+        go.Mesh3d(
+            x=vertices[:, 0], y=vertices[:, 1], z=vertices[:, 2],
+            i=faces[0], j=faces[1], k=faces[2],
+            facecolor=np.repeat(colors, 12),
+            hoverinfo='skip',
+            name='Boxes'
+        ),
+        go.Scatter3d(
+            x=positions[:, 0] + shapes[:, 0] / 2,
+            y=positions[:, 1] + shapes[:, 1] / 2,
+            z=positions[:, 2] + shapes[:, 2] / 2,
+            mode="markers",
+            marker=dict(
+                size=5,
+                color=colors
+            ),
+            customdata=details,
+            hovertemplate=hovertemplate,
+            name='Box centers'
+        )
+    ]
+
+
+def showGraphPlotly(placement, show=True, batched=False):
+    fig = go.Figure(batchedTraces(placement)
+                    if batched else boxTraces(placement))
+    objectives = placement['objectives']
+    gridX, gridY, gridZ = placement['grid']
     fig.add_annotation(
-        text=f"Inserted boxes: {len(individual.insertedBoxes)}", xref="paper", yref="paper", x=0, y=1, showarrow=False)
+        text=f"Inserted boxes: {len(placement['codes'])}", xref="paper", yref="paper", x=0, y=1, showarrow=False)
     fig.add_annotation(
-        text=f"Center of mass: {individual.objectives['center_of_mass']}", xref="paper", yref="paper", x=0, y=1.1, showarrow=False)
+        text=f"Center of mass: {objectives['center_of_mass']}", xref="paper", yref="paper", x=0, y=1.1, showarrow=False)
     fig.add_annotation(
-        text=f"Volume: {individual.objectives['volume']}", xref="paper", yref="paper", x=0, y=1.2, showarrow=False)
+        text=f"Volume: {objectives['volume']}", xref="paper", yref="paper", x=0, y=1.2, showarrow=False)
     fig.add_annotation(
-        text=f"Weight: {individual.objectives['weight']}", xref="paper", yref="paper", x=0, y=1.3, showarrow=False)
+        text=f"Weight: {objectives['weight']}", xref="paper", yref="paper", x=0, y=1.3, showarrow=False)
 
-    mins = min(individual.gridX, individual.gridY, individual.gridZ)
+    mins = min(gridX, gridY, gridZ)
 
     fig.update_layout(
         scene=dict(
-            xaxis=dict(nticks=4, range=[0, individual.gridX]),
-            yaxis=dict(nticks=4, range=[0, individual.gridY]),
-            zaxis=dict(nticks=4, range=[0, individual.gridZ])
+            xaxis=dict(nticks=4, range=[0, gridX]),
+            yaxis=dict(nticks=4, range=[0, gridY]),
+            zaxis=dict(nticks=4, range=[0, gridZ])
         ),
         scene_aspectmode='manual',
         scene_aspectratio=dict(
-            x=individual.gridX/mins, y=individual.gridY/mins, z=individual.gridZ/mins)
+            x=gridX/mins, y=gridY/mins, z=gridZ/mins)
     )
 
     if show:
@@ -78,13 +153,37 @@ def showGraphPlotly(individual, show=True):
     return fig
 
 
+# Above this many boxes figures are drawn as a single mesh by default
+BATCHED_BOXES = 100
+
+
+def serializeFigure(placement, batched=None):
+    if batched is None:
+        batched = len(placement['codes']) > BATCHED_BOXES
+    return json.dumps(showGraphPlotly(placement, show=False, batched=batched), cls=plotly.utils.PlotlyJSONEncoder)
+
+
+# Comparator and sort direction of every best individual criterion
+CRITERIA = {
+    "fitness": (lambda x: x.fitness, True),
+    "center_of_mass": (lambda x: x.objectives["center_of_mass"], False),
+    "volume": (lambda x: x.objectives["volume"], True),
+    "weight": (lambda x: x.objectives["weight"], True)
+}
+
+
 class Tester:
-    def __init__(self, GA, show=True, save=False, savePath=None, room_id=""):
+    def __init__(self, GA, show=True, save=False, savePath=None, room_id="", renderer=None):
         self.finalPopulation = GA.finalPopulation
+        self.stats = GA.stats
+        self.history = GA.history
         self.savePath = savePath
         self.save = save
         self.show = show
         self.room_id = room_id
+        self.figures = {}
+        self.analysis = None
+        self.renderer = renderer
 
         if save and self.savePath is not None:
             os.system("mkdir -p {}".format(savePath))
@@ -99,76 +198,25 @@ class Tester:
         for i in individuals:
             data.append([i.fitness, i.objectives['center_of_mass'],
                          i.objectives['volume'], i.objectives['weight']])
-            data.append([b.code for b in i.boxes] +
-                        [b.orientation for b in i.boxes])
+            data.append(i.genome.codes.tolist() +
+                        i.genome.orientations.tolist())
 
         f = open(os.path.join(self.savePath,
                               'population_{}.csv'.format("final")), 'w')
         csv.writer(f).writerows(data)
 
     def getObjectiveDevelopment(self):
-        weights = []
-        centerOfMasses = []
-        volumes = []
-
-        for p in self.populationHistory:
-            rankedIndividuals = self.getRankedIndividuals(p.fronts[0])
-            weights.append(rankedIndividuals[0].objectives['weight'])
-            centerOfMasses.append(
-                rankedIndividuals[0].objectives['center_of_mass'])
-            volumes.append(rankedIndividuals[0].objectives['volume'])
-
-        fig = plt.figure()
-        plt.plot(weights, label='objective development')
-        plt.title('Weight Objective Development on Best Individual')
-        plt.ylabel('Objective Value')
-        plt.xlabel("Generation")
-        plt.legend(loc='best')
-        if self.save:
-            fig.savefig(os.path.join(self.savePath,
-                                     "development_weight.jpg"), bbox_inches="tight")
-        if self.show:
-            plt.show()
-        plt.close()
-
-        fig = plt.figure()
-        plt.plot(centerOfMasses, label='objective development')
-        plt.title('Center of Mass Objective Development on Best Individual')
-        plt.ylabel('Objective Value')
-        plt.xlabel("Generation")
-        plt.legend(loc='best')
-        if self.save:
-            fig.savefig(os.path.join(self.savePath,
-                                     "development_centerofmass.jpg"), bbox_inches="tight")
-        if self.show:
-            plt.show()
-        plt.close()
-
-        fig = plt.figure()
-        plt.plot(volumes, label='objective development')
-        plt.title('Volume Objective Development on Best Individual')
-        plt.ylabel('Objective Value')
-        plt.xlabel("Generation")
-        plt.legend(loc='best')
-        if self.save:
-            fig.savefig(os.path.join(self.savePath,
-                                     "development_volume.jpg"), bbox_inches="tight")
-        if self.show:
-            plt.show()
-        plt.close()
+        # Best value of each objective per recorded generation
+        return self.renderCharts(developmentCharts(
+            self.history.column('generation'), self.history.column('weight_best'),
+            self.history.column('center_of_mass_best'), self.history.column('volume_best')))
 
     def getSpearmanRankCorrelation(self):
-        keys = [
-            key for key in self.finalPopulation.individuals[0].objectives]
-
-        objectives = [[i.objectives[key] for i in self.finalPopulation.fronts[0]]
-                      for key in keys]
-
-        correlation = [[stats.spearmanr(o1, o2).correlation
-                        for o2 in objectives] for o1 in objectives]
-
-        pvalue = [[stats.spearmanr(o1, o2).pvalue
-                   for o2 in objectives] for o1 in objectives]
+        analysis = self.getAnalysis()
+        keys = analysis.keys
+        correlation, pvalue = analysis.rankCorrelation()
+        correlation = correlation.tolist()
+        pvalue = pvalue.tolist()
 
         # Add table header
         correlation = [[keys[i]] + c for i, c in enumerate(correlation)]
@@ -191,156 +239,70 @@ class Tester:
             print("\nPValue")
             print(tabulate(pvalue, headers='firstrow'))
 
-    def getRankedIndividuals(self, individuals, comparator, reverse=True):
-        volumes = [i.objectives['volume']
-                   for i in individuals]
-        maxVol, minVol = max(volumes), min(volumes)
-        scaleVol = maxVol - minVol
-        if scaleVol == 0:
-            scaleVol = 1
-
-        weights = [i.objectives['weight']
-                   for i in individuals]
-        maxWei, minWei = max(weights), min(weights)
-        scaleWei = maxWei - minWei
-        if scaleWei == 0:
-            scaleWei = 1
-
-        centerOfMass = [i.objectives['center_of_mass']
-                        for i in individuals]
-        maxMass, minMass = max(centerOfMass), min(centerOfMass)
-        scaleMass = maxMass - minMass
-        if scaleMass == 0:
-            scaleMass = 1
-
-        for i in individuals:
-            i.fitness = 0
-
-            # Minimize
-            i.fitness += 1 - \
-                (i.objectives['center_of_mass'] - minMass) / scaleMass
-
-            # Maximize
-            i.fitness += (i.objectives['weight'] - minWei) / scaleWei
-            i.fitness += (i.objectives['volume'] - minVol) / scaleVol
-
-        return sorted(individuals, key=comparator, reverse=reverse)
+    def getAnalysis(self, individuals=None):
+        # The final front's analysis is built once and shared by every report
+        if individuals is None or individuals is self.finalPopulation.fronts[0]:
+            if self.analysis is None:
+                self.analysis = ObjectiveAnalysis(
+                    self.finalPopulation.fronts[0])
+            return self.analysis
+        return ObjectiveAnalysis(individuals)
+
+    def getRankedIndividuals(self, individuals, comparator=None, reverse=True):
+        analysis = self.getAnalysis(individuals)
+        for i, fitness in zip(individuals, analysis.fitness().tolist()):
+            i.fitness = fitness
+
+        return sorted(individuals, key=comparator if comparator is not None else CRITERIA["fitness"][0],
+                      reverse=reverse)
+
+    def getBestIndividuals(self, criteria):
+        # Winner of every criterion from one ranking of front 0, the first
+        # one in front order on ties like the sorted ranking
+        front = self.finalPopulation.fronts[0]
+        with self.stats.stage('render_rank'):
+            analysis = self.getAnalysis()
+            for i, fitness in zip(front, analysis.fitness().tolist()):
+                i.fitness = fitness
+            best = {comp_type: front[analysis.best(comp_type, CRITERIA[comp_type][1])]
+                    for comp_type in criteria}
+        return best
+
+    def getFigure(self, individual):
+        # Serialized figures are kept per individual, criteria picking the
+        # same one share it
+        key = individual.genome.key()
+        if key not in self.figures:
+            placement = placementOf(individual)
+            with self.stats.stage('render_plot'):
+                fig = showGraphPlotly(placement, show=self.show,
+                                      batched=len(placement['codes']) > BATCHED_BOXES)
+
+            with self.stats.stage('render_serialize'):
+                self.figures[key] = json.dumps(
+                    fig, cls=plotly.utils.PlotlyJSONEncoder)
+            self.stats.count('render_bytes', len(self.figures[key]))
+        return self.figures[key]
 
     def getBestIndividual(self, comp_type="fitness"):
-        if comp_type == "fitness":
-            def comparator(x): return x.fitness
-        elif comp_type == "center_of_mass":
-            def comparator(x): return x.objectives["center_of_mass"]
-        elif comp_type == "volume":
-            def comparator(x): return x.objectives["volume"]
-        elif comp_type == "weight":
-            def comparator(x): return x.objectives["weight"]
-
-        rankedIndividuals = self.getRankedIndividuals(
-            self.finalPopulation.fronts[0], comparator, reverse=False if comp_type == "center_of_mass" else True)
-
-        fig = showGraphPlotly(rankedIndividuals[0], show=self.show)
-
-        graphJSON = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-
-        return graphJSON
+        return self.getFigure(self.getBestIndividuals([comp_type])[comp_type])
 
     def getObjectiveGraph(self):
-        volumes = [i.objectives['volume']
-                   for i in self.finalPopulation.fronts[0]]
-        weights = [i.objectives['weight']
-                   for i in self.finalPopulation.fronts[0]]
-        centerOfMass = [i.objectives['center_of_mass']
-                        for i in self.finalPopulation.fronts[0]]
-
-        vol = [i.objectives['volume']
-               for i in self.finalPopulation.fronts[0]]
-        com = [i.objectives['center_of_mass']
-               for i in self.finalPopulation.fronts[0]]
-        wei = [i.objectives['weight']
-               for i in self.finalPopulation.fronts[0]]
-
-        fig = plt.figure()
-        ax = fig.add_subplot(111, projection='3d')
-        ax.scatter(vol, com, wei, c=wei, cmap='viridis')
-        ax.set_xlabel('Volume')
-        ax.set_ylabel('Center of Mass')
-        ax.set_zlabel('Weight')
-        if self.save:
-            fig.savefig(os.path.join(self.savePath,
-                                     'scatter_all_{}.jpg'.format("final")), bbox_inches="tight")
-        if self.show:
-            plt.show()
-        plt.close()
-
-        # CENTER OF MASS & VOLUME
-        fig = plt.figure()
-        plt.title('Center of Mass & Volume Scatter Plot')
-        plt.scatter(vol, com, c=com, cmap='viridis')
-        plt.xlabel('Volume')
-        plt.ylabel('Center of Mass')
-        if self.save:
-            fig.savefig(os.path.join(self.savePath,
-                                     'scatter_volume_centerofmass_{}.jpg'.format("final")), bbox_inches="tight")
-        if self.show:
-            plt.show()
-        plt.close()
-
-        # VOLUME & WEIGHT
-        fig = plt.figure()
-        plt.title('Volume & Weight Scatter Plot')
-        plt.scatter(vol, wei, c=wei, cmap='viridis')
-        plt.xlabel('Volume')
-        plt.ylabel('Weight')
-        if self.save:
-            fig.savefig(os.path.join(self.savePath,
-                                     'scatter_volume_weight_{}.jpg'.format("final")), bbox_inches="tight")
-        if self.show:
-            plt.show()
-        plt.close()
-
-        # CENTER OF MASS & WEIGHT
-        fig = plt.figure()
-        plt.title('Center of Mass & Weight Scatter Plot')
-        plt.scatter(com, wei, c=wei, cmap='viridis')
-        plt.xlabel('Center of Mass')
-        plt.ylabel('Weight')
-        if self.save:
-            fig.savefig(os.path.join(self.savePath,
-                                     'scatter_centerofmass_weight_{}.jpg'.format("final")), bbox_inches="tight")
-        if self.show:
-            plt.show()
-        plt.close()
-
-        # Box Plot Volume
-        fig = plt.figure()
-        plt.title('Volume')
-        plt.boxplot(volumes)
-        if self.save:
-            fig.savefig(os.path.join(self.savePath,
-                                     'boxplot_volume_{}.jpg'.format("final")), bbox_inches="tight")
-        if self.show:
-            plt.show()
-        plt.close()
-
-        # Box Plot Weight
-        fig = plt.figure()
-        plt.title('Weight')
-        plt.boxplot(weights)
-        if self.save:
-            fig.savefig(os.path.join(self.savePath,
-                                     'boxplot_weight_{}.jpg'.format("final")), bbox_inches="tight")
-        if self.show:
-            plt.show()
-        plt.close()
-
-        # Box Plot Center of Mass
-        fig = plt.figure()
-        plt.title('Center of Mass')
-        plt.boxplot(centerOfMass)
-        if self.save:
-            fig.savefig(os.path.join(self.savePath,
-                                     'boxplot_centerofmass_{}.jpg'.format("final")), bbox_inches="tight")
-        if self.show:
-            plt.show()
-        plt.close()
+        analysis = self.getAnalysis()
+        return self.renderCharts(objectiveCharts(analysis.column('volume'), analysis.column('weight'),
+                                                 analysis.column('center_of_mass')))
+
+    def reportCharts(self):
+        # Every report chart of the run, for a renderer outside this process
+        analysis = self.getAnalysis()
+        return objectiveCharts(analysis.column('volume'), analysis.column('weight'),
+                               analysis.column('center_of_mass')) + \
+            developmentCharts(self.history.column('generation'), self.history.column('weight_best'),
+                              self.history.column('center_of_mass_best'), self.history.column('volume_best'))
+
+    def renderCharts(self, charts):
+        # Saved charts go to the report workers when there are some, the
+        # caller gets their futures back instead of waiting for the images
+        if self.renderer is not None and self.save and not self.show:
+            return self.renderer.submit(charts, self.savePath)
+        return renderCharts(charts, self.savePath if self.save else None, show=self.show)
@@ -0,0 +1,100 @@
+import os
+import json
+import zlib
+import struct
+import numpy as np
+from results import atomicWrite
+
+# Binary result layout, little endian:
+#   b'GAR1' | flags uint8 (1 = zlib body) | 3 zero bytes | body
+# body:
+#   header length uint32 | JSON header | arrays, each 8 byte aligned
+# The header holds the scalar fields and, per array, its name, dtype, shape
+# and offset into the array section, enough for a DataView based client.
+# The 8 byte prefix keeps the arrays of an uncompressed result aligned in
+# the whole buffer too, so typed array views can be made on it directly.
+MAGIC = b'GAR1'
+COMPRESSED = 1
+PREFIX_LENGTH = 8
+
+# Column order of the objective arrays
+OBJECTIVE_KEYS = ['volume', 'weight', 'center_of_mass']
+
+
+def packArrays(fields, arrays, compress=True, level=6):
+    header = dict(fields, arrays=[])
+    chunks = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+        header['arrays'].append({'name': name, 'dtype': array.dtype.str,
+                                 'shape': list(array.shape), 'offset': offset})
+        data = array.tobytes()
+        padding = -len(data) % 8
+        chunks.append(data + b'\0' * padding)
+        offset += len(data) + padding
+
+    headerBytes = json.dumps(header).encode()
+    headerBytes += b' ' * (-(len(headerBytes) + 4) % 8)
+    body = struct.pack('<I', len(headerBytes)) + headerBytes + b''.join(chunks)
+
+    flags = COMPRESSED if compress else 0
+    prefix = MAGIC + bytes([flags]) + b'\0' * (PREFIX_LENGTH - len(MAGIC) - 1)
+    return prefix + (zlib.compress(body, level) if compress else body)
+
+
+def unpackArrays(data):
+    if data[:4] != MAGIC:
+        raise ValueError("Not a packed result")
+    body = data[PREFIX_LENGTH:]
+    if data[4] & COMPRESSED:
+        body = zlib.decompress(body)
+    headerLength = struct.unpack('<I', body[:4])[0]
+    header = json.loads(body[4:4 + headerLength])
+    start = 4 + headerLength
+
+    arrays = {}
+    for spec in header.pop('arrays'):
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[spec['name']] = np.frombuffer(body, dtype=dtype, count=count,
+                                             offset=start + spec['offset']).reshape(spec['shape'])
+    return header, arrays
+
+
+def frontObjectives(front):
+    # (individuals, 3) objective matrix of a front in OBJECTIVE_KEYS order
+    return np.array([[individual.objectives[key] for key in OBJECTIVE_KEYS] for individual in front],
+                    dtype=np.float64).reshape(-1, len(OBJECTIVE_KEYS))
+
+
+def encodeFront(front, compress=True):
+    return packArrays({'objective_keys': OBJECTIVE_KEYS},
+                      {'front_objectives': frontObjectives(front)}, compress=compress)
+
+
+def encodeResult(placement, compress=True):
+    # Packed form of a placement: codes, positions and sizes as typed
+    # arrays plus its objectives
+    boxes = np.asarray(placement['placements']).reshape(-1, 6)
+    boxDtype = np.int32 if np.issubdtype(
+        boxes.dtype, np.integer) else np.float32
+    arrays = {
+        'codes': np.asarray(placement['codes'], dtype=np.int32),
+        'positions': boxes[:, :3].astype(boxDtype),
+        'sizes': boxes[:, 3:].astype(boxDtype),
+        'objectives': np.array([placement['objectives'][key] for key in OBJECTIVE_KEYS], dtype=np.float64),
+        'grid': np.asarray(placement['grid'], dtype=np.int32)
+    }
+
+    return packArrays({'individual': placement['individual'], 'objective_keys': OBJECTIVE_KEYS},
+                      arrays, compress=compress)
+
+
+def saveResult(jobId, individual, data, directory='static'):
+    # Packed result under the static route, returns its URL
+    relative = '/'.join(['results', jobId, '{}.bin'.format(individual)])
+    with atomicWrite(os.path.join(directory, *relative.split('/'))) as f:
+        f.write(data)
+    return '/static/' + relative
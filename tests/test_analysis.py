@@ -0,0 +1,50 @@
+import random
+import warnings
+import numpy as np
+import pytest
+from scipy import stats
+from analysis import ObjectiveAnalysis
+
+
+class Individual:
+    def __init__(self, volume, weight, centerOfMass):
+        self.objectives = {'center_of_mass': centerOfMass,
+                           'volume': volume, 'weight': weight}
+
+
+def pairwise(individuals, keys):
+    # The per pair table the reports were built from before
+    columns = [[i.objectives[key] for i in individuals] for key in keys]
+    correlation = [[stats.spearmanr(a, b).correlation for b in columns]
+                   for a in columns]
+    pvalue = [[stats.spearmanr(a, b).pvalue for b in columns]
+              for a in columns]
+    return np.array(correlation, dtype=float), np.array(pvalue, dtype=float)
+
+
+@pytest.mark.parametrize('constant', [None, 'volume', 'weight', 'center_of_mass'])
+def test_rank_correlation_matches_pairwise(constant):
+    rng = random.Random(3)
+    individuals = [Individual(rng.randint(0, 50), rng.randint(0, 50), rng.random())
+                   for _ in range(12)]
+    if constant is not None:
+        for i in individuals:
+            i.objectives[constant] = 7
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        analysis = ObjectiveAnalysis(individuals)
+        correlation, pvalue = analysis.rankCorrelation()
+        expected = pairwise(individuals, analysis.keys)
+
+    assert correlation.shape == (3, 3)
+    np.testing.assert_allclose(correlation, expected[0], equal_nan=True)
+    np.testing.assert_allclose(pvalue, expected[1], atol=1e-12, equal_nan=True)
+
+
+def test_rank_correlation_single_individual():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        correlation, pvalue = ObjectiveAnalysis(
+            [Individual(1, 2, 3)]).rankCorrelation()
+    assert correlation.shape == (3, 3) and pvalue.shape == (3, 3)
@@ -0,0 +1,89 @@
+import itertools
+import os
+import random
+import pytest
+import data_gen
+from convergence import hypervolume, ConvergenceTracker
+from ga import GeneticAlgorithm
+from genome import BoxTable, Genome
+from progress import NullEmitter
+
+
+def inclusionExclusion(points, reference=(1.0, 1.0, 1.0)):
+    # Union of the boxes between every point and the reference, one term per
+    # non empty subset of points
+    volume = 0.0
+    for size in range(1, len(points) + 1):
+        for subset in itertools.combinations(points, size):
+            box = 1.0
+            for axis, bound in enumerate(reference):
+                box *= max(0.0, bound - max(point[axis] for point in subset))
+            volume += (-1) ** (size + 1) * box
+    return volume
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('count', [1, 2, 5, 9])
+@pytest.mark.parametrize('coarse', [True, False])
+def test_hypervolume_matches_inclusion_exclusion(seed, count, coarse):
+    rng = random.Random(seed)
+    # A coarse grid gives ties and duplicates, 1.25 puts some points past
+    # the reference
+    points = [tuple(rng.choice([0.0, 0.25, 0.5, 0.75, 1.0, 1.25]) if coarse else rng.uniform(0, 1.1)
+                    for _ in range(3))
+              for _ in range(count)]
+    assert hypervolume(points) == pytest.approx(inclusionExclusion(points))
+
+
+def test_hypervolume_of_nothing():
+    assert hypervolume([]) == 0.0
+    assert hypervolume([(1.0, 0.5, 0.5)]) == 0.0
+
+
+class Packed:
+    def __init__(self, code, volume, weight, centerOfMass):
+        self.genome = Genome([code], [0])
+        self.objectives = {'volume': volume, 'weight': weight, 'center_of_mass': centerOfMass}
+
+
+def tracker(patience):
+    return ConvergenceTracker(BoxTable([[1, 4, 4, 4, 10], [2, 4, 4, 4, 10]]), 10, 10, 10, patience=patience)
+
+
+@pytest.mark.parametrize('generations, stopsAt', [([1, 2, 3, 4, 5], 4), ([5, 10, 15], 10)])
+def test_patience_counts_generations(generations, stopsAt):
+    # Island runs update once per epoch, the stall still counts generations
+    convergence = tracker(patience=3)
+    front = [Packed(1, 64, 10, 2.0)]
+    for generation in generations:
+        convergence.update(generation, front)
+        if convergence.stopReason() is not None:
+            break
+    assert convergence.stopReason() == 'converged'
+    assert generation == stopsAt
+
+
+def test_improvement_resets_patience():
+    convergence = tracker(patience=2)
+    convergence.update(1, [Packed(1, 64, 10, 2.0)])
+    convergence.update(2, [Packed(1, 64, 10, 2.0)])
+    convergence.update(3, [Packed(2, 128, 10, 2.0)])
+    convergence.update(4, [Packed(2, 128, 10, 2.0)])
+    assert convergence.stopReason() is None
+    convergence.update(5, [Packed(2, 128, 10, 2.0)])
+    assert convergence.stopReason() == 'converged'
+
+
+@pytest.mark.parametrize('migrationInterval', [1, 5])
+def test_island_run_stops_after_patience_generations(monkeypatch, migrationInterval):
+    # Three boxes that always fit, the front stops improving after a few
+    # generations
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    boxes = [[1, 2, 3, 4, 5], [2, 3, 3, 2, 7], [3, 1, 2, 2, 3]]
+    population = data_gen.loadData(boxes, 20, 20, 20, 8, rng=random.Random(1))
+    GA = GeneticAlgorithm(population, 0.3, 200, room_id=None, socket=NullEmitter(), rng=random.Random(2),
+                          islands=2, migrationInterval=migrationInterval, patience=3)
+    GA.start()
+
+    assert GA.stopReason == 'converged'
+    assert 3 <= GA.generation - GA.convergence.bestGeneration < 3 + migrationInterval
@@ -0,0 +1,34 @@
+import random
+from evaluator import DecodeCache, Evaluator
+from genome import BoxTable
+from individual import Individual
+from test_individual import randomGenome, randomLoad
+
+
+def test_evaluate_reuses_cached_decodes():
+    rng = random.Random(2)
+    boxes, grid = randomLoad(rng, 30)
+    boxTable = BoxTable(boxes)
+    genomes = [randomGenome(rng, len(boxes)) for _ in range(4)]
+    evaluator = Evaluator(boxTable, *grid)
+
+    first = evaluator.evaluate(genomes + genomes[:2])
+    again = evaluator.evaluate(genomes)
+    assert evaluator.cache.misses == 4 and evaluator.cache.hits == 4
+    for individual, genome in zip(first + again, genomes + genomes[:2] + genomes):
+        assert individual.objectives == Individual(genome, boxTable, *grid).objectives
+
+
+def test_decode_cache_evicts_to_its_byte_budget():
+    rng = random.Random(3)
+    boxes, grid = randomLoad(rng, 30)
+    boxTable = BoxTable(boxes)
+    decoded = [Individual(randomGenome(rng, len(boxes)), boxTable, *grid).getDecoded() for _ in range(6)]
+    budget = sum(DecodeCache.sizeOf(result) for result in decoded[:3])
+    cache = DecodeCache(budget)
+    for key, result in enumerate(decoded):
+        cache.put(key, result)
+
+    assert 0 < cache.bytes <= budget
+    assert cache.bytes == sum(DecodeCache.sizeOf(result) for result in cache.entries.values())
+    assert 5 in cache.entries and 0 not in cache.entries
@@ -0,0 +1,78 @@
+import random
+import pytest
+import checkpoint
+import data_gen
+from ga import GeneticAlgorithm
+from population import Population
+from progress import NullEmitter
+
+
+def randomRun(seed, populationSize):
+    rng = random.Random(seed)
+    boxes = [[code, rng.randint(2, 9), rng.randint(2, 9), rng.randint(2, 9), rng.randint(1, 20)]
+             for code in range(1, 21)]
+    population = data_gen.loadData(boxes, 15, 15, 12, populationSize, rng=rng)
+    return GeneticAlgorithm(population, 0.3, 1, room_id=None, socket=NullEmitter(), rng=rng)
+
+
+@pytest.mark.parametrize('seed', range(6))
+@pytest.mark.parametrize('populationSize', [2, 9, 24])
+def test_survivors_keep_fronts_of_a_resort(seed, populationSize):
+    GA = randomRun(seed, populationSize)
+    children = GA.prepare()
+    for _ in range(2):
+        merged = Population()
+        merged.extend(GA.population.individuals + children)
+        survivors = GA.selectSurvivors(merged)
+        fronts = [list(front) for front in survivors.fronts]
+        crowding = [individual.crowdingDistance for individual in survivors.individuals]
+
+        # A second sort of the survivors, what selection used to do
+        resorted = Population()
+        resorted.extend(survivors.individuals)
+        GA.fastNonDominatedSort(resorted)
+        GA.calculateCrowdingDistances(resorted.fronts)
+
+        assert len(survivors) == populationSize
+        assert [[id(i) for i in front] for front in fronts] == \
+            [[id(i) for i in front] for front in resorted.fronts]
+        assert crowding == pytest.approx(
+            [individual.crowdingDistance for individual in survivors.individuals])
+
+        GA.population = survivors
+        children = GA.createChildren(survivors)
+
+
+def seededRun(maxGeneration, **options):
+    rng = random.Random(5)
+    boxes = [[code, rng.randint(2, 9), rng.randint(2, 9), rng.randint(2, 9), rng.randint(1, 20)]
+             for code in range(1, 21)]
+    population = data_gen.loadData(boxes, 15, 15, 12, 16, rng=random.Random(6))
+    return GeneticAlgorithm(population, 0.3, maxGeneration, room_id=None, socket=NullEmitter(),
+                            rng=random.Random(7), **options)
+
+
+def state(GA):
+    return [(individual.genome.key(), individual.rank, individual.crowdingDistance)
+            for individual in GA.population.individuals]
+
+
+@pytest.mark.parametrize('checkpointInterval', [2, 4])
+def test_resume_reproduces_a_straight_run(tmp_path, monkeypatch, checkpointInterval):
+    # Stopped at generation 6, a multiple of one interval but not the other,
+    # and extended to 10
+    monkeypatch.setenv('GA_CHECKPOINT_DIR', str(tmp_path))
+    path = checkpoint.checkpointPath('ab12')
+
+    straight = seededRun(10)
+    straight.start()
+
+    interrupted = seededRun(6, checkpointPath=path, checkpointInterval=checkpointInterval)
+    interrupted.start()
+    resumed = GeneticAlgorithm.fromCheckpoint(path, None, maxGeneration=10, socket=NullEmitter(),
+                                              rng=random.Random())
+    assert resumed.generation == 6
+    resumed.start()
+
+    assert resumed.generation == straight.generation == 10
+    assert state(resumed) == state(straight)
@@ -0,0 +1,100 @@
+import pytest
+from history import ObjectiveHistory
+from population import Population
+from progress import ProgressReporter
+
+
+class Individual:
+    def __init__(self, volume, weight, centerOfMass):
+        self.objectives = {'weight': weight, 'volume': volume,
+                           'center_of_mass': centerOfMass}
+
+
+class Socket:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, payload, room=None):
+        self.events.append((event, payload))
+
+
+def populationAt(generation):
+    # Front 0 values follow the generation, a dominated rest does not
+    population = Population()
+    front = [Individual(10 * generation, generation, 1.0),
+             Individual(10 * generation + 5, generation + 1, 2.0)]
+    population.extend(front + [Individual(0, 1000, 99.0)])
+    population.fronts = [front, population.individuals[2:], []]
+    return population
+
+
+def record(history, generations):
+    for generation in generations:
+        history.record(generation, populationAt(generation),
+                       {'hypervolume': generation / 100, 'churn': 0.5})
+
+
+def test_ring_keeps_the_last_generations_in_order():
+    history = ObjectiveHistory(4, 'ring')
+    record(history, range(1, 12))
+    assert len(history) == 4
+    assert history.column('generation').tolist() == [8, 9, 10, 11]
+    assert [row['generation'] for row in history.rows(after=9)] == [10, 11]
+    assert [row['generation'] for row in history.rows(limit=1)] == [11]
+
+
+def test_ring_before_it_is_full():
+    history = ObjectiveHistory(4, 'ring')
+    record(history, range(1, 4))
+    assert history.column('generation').tolist() == [1, 2, 3]
+
+
+@pytest.mark.parametrize('generations, kept', [
+    (4, [1, 2, 3, 4]),
+    (5, [1, 3, 5]),
+    (11, [1, 5, 9]),
+    (17, [1, 9, 17]),
+])
+def test_downsample_keeps_every_stride_generation(generations, kept):
+    history = ObjectiveHistory(4, 'downsample')
+    record(history, range(1, generations + 1))
+    assert history.column('generation').tolist() == kept
+    assert len(history) <= 4
+
+
+@pytest.mark.parametrize('mode', ['ring', 'downsample'])
+def test_latest_is_the_last_recorded_generation(mode):
+    history = ObjectiveHistory(4, mode)
+    record(history, range(1, 12))
+    latest = history.latest()
+    assert latest['generation'] == 11
+    assert latest['hypervolume'] == pytest.approx(0.11)
+    assert latest['volume_best'] == 115
+    assert latest['weight_best'] == 11
+
+
+def test_statistics_cover_front_zero():
+    history = ObjectiveHistory(4)
+    record(history, [3])
+    latest = history.latest()
+    assert latest['front_size'] == 2
+    assert latest['volume_min'] == 30
+    assert latest['weight_mean'] == pytest.approx(3.5)
+    assert latest['center_of_mass_best'] == 1.0
+
+
+def test_progress_reports_the_current_generation_after_downsampling():
+    socket = Socket()
+    history = ObjectiveHistory(4, 'downsample')
+    reporter = ProgressReporter(socket, 'room', minInterval=0)
+    for generation in range(1, 12):
+        population = populationAt(generation)
+        history.record(generation, population, {'hypervolume': generation / 100, 'churn': 0.5})
+        reporter.update(generation, population, history=history, force=generation == 11)
+
+    payloads = [payload for _, payload in socket.events]
+    assert [payload['n'] for payload in payloads] == list(range(1, 12))
+    for payload in payloads:
+        assert payload['best']['volume'] == 10 * payload['n'] + 5
+        assert payload['hypervolume'] == pytest.approx(payload['n'] / 100)
+        assert payload['trajectory'][-1]['generation'] == payload['n']
@@ -0,0 +1,130 @@
+import math
+import random
+import pytest
+from genome import BoxTable, Genome
+from individual import Individual
+from prefix_cache import PrefixCache
+
+
+def referencePacking(boxes, genome, gridX, gridY, gridZ):
+    # The bottom-left packer the decoder started from: every inserted box is
+    # checked against every candidate point, in (z, y, x) order
+    rows = {box[0]: box[1:] for box in boxes}
+    placed = []
+    positionSet = [(0, 0, 0)]
+    maxHeight = 0
+
+    def isValidInsert(shape, pos):
+        nonHangingArea = 0
+        length, width, height = shape
+        x1min, y1min, z1min = pos
+        x1max, y1max, z1max = x1min + length, y1min + width, z1min + height
+        if x1max > gridX or y1max > gridY or z1max > gridZ:
+            return False
+        for _, (x2min, y2min, z2min), (length2, width2, height2) in placed:
+            x2max, y2max, z2max = x2min + length2, y2min + width2, z2min + height2
+            footprint = x1min + 0.5 < x2max and x2min < x1max - 0.5 and y1min + 0.5 < y2max and y2min < y1max - 0.5
+            if footprint and z1min + 0.5 < z2max and z2min < z1max - 0.5:
+                return False
+            if footprint and z1min == z2max:
+                nonHangingArea += (min(x1max, x2max) - max(x1min, x2min)) * \
+                    (min(y1max, y2max) - max(y1min, y2min))
+        return z1min == 0 or nonHangingArea == (x1max - x1min) * (y1max - y1min)
+
+    for index, (code, orientation) in enumerate(genome.genes()):
+        length, width, height, _ = rows[code]
+        shape = (width, length, height) if orientation == 1 else (length, width, height)
+        for i, position in enumerate(positionSet):
+            if isValidInsert(shape, position):
+                posX, posY, posZ = position
+                positionSet.pop(i)
+                positionSet += [(posX + shape[0], posY, posZ), (posX, posY + shape[1], posZ),
+                                (posX, posY, posZ + shape[2])]
+                positionSet.sort(key=lambda point: (point[2], point[1], point[0]))
+                placed.append((index, position, shape))
+                maxHeight = max(maxHeight, posZ + shape[2])
+                break
+
+    sumX = sumY = sumZ = sumWeight = volume = totalWeight = 0
+    for index, (posX, posY, posZ), (length, width, height) in placed:
+        weight = rows[genome.codes[index]][3]
+        volume += length * width * height
+        sumX += (posX + length / 2.0) * weight
+        sumY += (posY + width / 2.0) * weight
+        sumZ += (posZ + height / 2.0) * weight
+        sumWeight += weight
+        totalWeight += weight
+    sumWeight = 1 if sumWeight == 0 else sumWeight
+    centerOfMass = math.sqrt(((gridX / 2.0) - sumX / sumWeight)**2 + ((gridY / 2.0) - sumY / sumWeight)**2 +
+                             ((maxHeight / 2.0) - sumZ / sumWeight)**2)
+    return [(index, position) for index, position, _ in placed], maxHeight, \
+        {'weight': totalWeight, 'volume': volume, 'center_of_mass': centerOfMass}
+
+
+def randomLoad(rng, boxCount):
+    boxes = [[code, rng.randint(2, 9), rng.randint(2, 9), rng.randint(2, 9), rng.randint(1, 20)]
+             for code in range(1, boxCount + 1)]
+    side = rng.randint(10, 20)
+    return boxes, (side, rng.randint(10, 20), rng.randint(8, 16))
+
+
+def randomGenome(rng, boxCount):
+    codes = list(range(1, boxCount + 1))
+    rng.shuffle(codes)
+    return Genome(codes, [rng.randint(0, 1) for _ in codes])
+
+
+def assertSamePacking(individual, expected):
+    placements, maxHeight, objectives = expected
+    assert list(zip(individual.insertedIndices.tolist(), map(tuple, individual.positions.tolist()))) == placements
+    assert individual.maxHeight == maxHeight
+    assert individual.objectives['weight'] == objectives['weight']
+    assert individual.objectives['volume'] == objectives['volume']
+    assert individual.objectives['center_of_mass'] == pytest.approx(objectives['center_of_mass'])
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_decoder_matches_reference(seed):
+    rng = random.Random(seed)
+    boxes, grid = randomLoad(rng, 40)
+    boxTable = BoxTable(boxes)
+    for _ in range(3):
+        genome = randomGenome(rng, len(boxes))
+        assertSamePacking(Individual(genome, boxTable, *grid),
+                          referencePacking(boxes, genome, *grid))
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_prefix_cache_decoder_matches_reference(seed):
+    # Children sharing long prefixes with their parent resume from its
+    # snapshots and must still pack like a decode from the first box
+    rng = random.Random(seed)
+    boxes, grid = randomLoad(rng, 40)
+    boxTable = BoxTable(boxes)
+    cache = PrefixCache(interval=4, maxBytes=1 << 20)
+    parent = randomGenome(rng, len(boxes))
+    genomes = [parent]
+    for _ in range(6):
+        child = Genome(parent.codes.copy(), parent.orientations.copy())
+        position = rng.randint(len(boxes) // 2, len(boxes) - 1)
+        child.orientations[position] ^= 1
+        genomes.append(child)
+
+    for genome in genomes:
+        assertSamePacking(Individual(genome, boxTable, *grid, prefixCache=cache),
+                          referencePacking(boxes, genome, *grid))
+    assert cache.hits > 0
+    assert cache.bytes <= cache.maxBytes
+
+
+def test_prefix_cache_evicts_to_its_byte_budget():
+    rng = random.Random(1)
+    boxes, grid = randomLoad(rng, 40)
+    boxTable = BoxTable(boxes)
+    cache = PrefixCache(interval=4, maxBytes=2048)
+    for _ in range(5):
+        genome = randomGenome(rng, len(boxes))
+        assertSamePacking(Individual(genome, boxTable, *grid, prefixCache=cache),
+                          referencePacking(boxes, genome, *grid))
+    assert 0 < cache.bytes <= 2048
+    assert cache.bytes == sum(PrefixCache.sizeOf(snapshot) for snapshot in cache.entries.values())
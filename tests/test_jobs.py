@@ -0,0 +1,155 @@
+import threading
+import time
+import pytest
+import jobs
+from jobs import JobManager, JobRejected
+
+
+class Socket:
+    # Captures every event with the job statuses at the time it was sent
+    def __init__(self):
+        self.manager = None
+        self.events = []
+
+    def emit(self, event, payload, room=None):
+        statuses = {jobId: job.status for jobId, job in self.manager.jobs.items()}
+        self.events.append((payload, room, statuses))
+
+    def statuses(self, status):
+        return [(payload, statuses) for payload, _, statuses in self.events if payload['status'] == status]
+
+
+@pytest.fixture
+def gate():
+    # Jobs run until the gate opens, or until they are cancelled
+    return threading.Event()
+
+
+@pytest.fixture
+def started(monkeypatch, gate):
+    started = []
+
+    def runJob(jobId, data, roomId, cancelEvent, socket=None, resultConnection=None):
+        started.append(jobId)
+        while not gate.wait(0.01):
+            if cancelEvent.is_set():
+                break
+        resultConnection.send(("cancelled" if cancelEvent.is_set() else "done", None, None))
+        resultConnection.close()
+
+    monkeypatch.setattr(jobs, 'runJob', runJob)
+    return started
+
+
+@pytest.fixture
+def manager(started, gate):
+    managers = []
+
+    def manager(**options):
+        socket = Socket()
+        jobManager = JobManager(local=True, socket=socket, **options)
+        socket.manager = jobManager
+        managers.append(jobManager)
+        return jobManager, socket
+
+    yield manager
+    # Drain every manager while runJob is still patched, a dispatcher left
+    # behind would start its queued jobs in a later test
+    gate.set()
+    for jobManager in managers:
+        for jobId in list(jobManager.jobs):
+            jobManager.cancel(jobId)
+        waitFor(lambda: len(jobManager.running) == 0)
+
+
+def waitFor(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_rejects_requests_past_max_queued(manager, started):
+    jobManager, _ = manager(workers=1, maxQueued=2)
+    jobManager.submit({}, 'room')
+    waitFor(lambda: len(started) == 1)
+
+    # A batch is a single queued request
+    jobManager.submitBatch([{}] * 5, {}, 'room')
+    jobManager.submit({}, 'room')
+    with pytest.raises(JobRejected):
+        jobManager.submit({}, 'room')
+    with pytest.raises(JobRejected):
+        jobManager.submitBatch([{}], {}, 'room')
+    assert jobManager.queuedRequests() == 2 and jobManager.queueLength() == 6
+
+
+def test_rejects_jobs_past_max_queued_jobs(manager, started):
+    jobManager, _ = manager(workers=1, maxQueued=16, maxQueuedJobs=3)
+    jobManager.submit({}, 'room')
+    waitFor(lambda: len(started) == 1)
+
+    with pytest.raises(JobRejected):
+        jobManager.submitBatch([{}] * 4, {}, 'room')
+    jobManager.submitBatch([{}] * 3, {}, 'room')
+    with pytest.raises(JobRejected):
+        jobManager.submit({}, 'room')
+    assert jobManager.queueLength() == 3
+
+
+def test_rejects_processes_past_the_cpu_share(manager, started):
+    jobManager, _ = manager(workers=1)
+    with pytest.raises(JobRejected):
+        jobManager.submit({'islands': jobManager.cpuShare + 1}, 'room')
+    with pytest.raises(JobRejected):
+        jobManager.submitBatch([{'workers': jobManager.cpuShare + 1}], {}, 'room')
+    assert jobManager.queueLength() == 0
+
+
+def test_cancel_queued_job(manager, started, gate):
+    jobManager, socket = manager(workers=1)
+    running = jobManager.submit({}, 'room')
+    waitFor(lambda: len(started) == 1)
+    queued = jobManager.submit({}, 'other')
+
+    assert jobManager.cancel(queued)
+    assert jobManager.getStatus(queued) == "cancelled"
+    assert jobManager.queueLength() == 0
+    assert jobManager.metrics.jobs["cancelled"] == 1
+    assert [(payload['job_id'], room) for payload, room, _ in socket.events
+            if payload['status'] == "cancelled"] == [(queued, 'other')]
+
+    gate.set()
+    waitFor(lambda: jobManager.getStatus(running) == "done")
+    assert started == [running]
+    assert not jobManager.cancel(queued)
+
+
+def test_batches_interleave_with_single_jobs(manager, started, gate):
+    jobManager, _ = manager(workers=1)
+    first = jobManager.submit({}, 'room')
+    waitFor(lambda: len(started) == 1)
+    _, batch, _ = jobManager.submitBatch([{}] * 3, {}, 'room')
+    singles = [jobManager.submit({}, 'room') for _ in range(2)]
+
+    gate.set()
+    waitFor(lambda: len(started) == 6)
+    assert started == [first, batch[0], singles[0], singles[1], batch[1], batch[2]]
+
+
+def test_batch_done_after_every_job_finished(manager, started, gate):
+    jobManager, socket = manager(workers=2)
+    batchId, jobIds, seed = jobManager.submitBatch([{}] * 4, {'population_size': 4}, 'room', seed=3)
+    jobManager.cancel(jobIds[3])
+    gate.set()
+    waitFor(lambda: len(socket.statuses("batch-done")) == 1)
+
+    progress = socket.statuses("batch-progress")
+    assert [payload['finished'] for payload, _ in progress] == [1, 2, 3, 4]
+    assert sorted(payload['job_id'] for payload, _ in progress) == sorted(jobIds)
+
+    payload, statuses = socket.statuses("batch-done")[0]
+    assert payload == {'status': "batch-done", 'batch_id': batchId, 'seed': str(seed)}
+    assert socket.events[-1][0] is payload
+    assert [statuses[jobId] for jobId in jobIds] == ["done", "done", "done", "cancelled"]
+    assert batchId not in jobManager.batches
@@ -0,0 +1,70 @@
+import random
+import numpy as np
+import pytest
+import ranking
+from individual import Individual as PackedIndividual
+
+
+class Individual:
+    dominates = PackedIndividual.dominates
+
+    def __init__(self, volume, weight, centerOfMass):
+        self.objectives = {'weight': weight, 'volume': volume,
+                           'center_of_mass': centerOfMass}
+        self.crowdingDistance = None
+
+
+def randomIndividuals(rng, count, spread):
+    # Small integer ranges give plenty of ties and duplicates
+    return [Individual(rng.randint(0, spread), rng.randint(0, spread), rng.randint(0, spread))
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('count, spread', [(1, 3), (12, 2), (40, 5), (150, 20)])
+def test_numpy_sort_matches_python(seed, count, spread):
+    individuals = randomIndividuals(random.Random(seed), count, spread)
+    assert ranking.numpyNonDominatedSort(individuals) == \
+        ranking.pythonNonDominatedSort(individuals)
+
+
+def test_numpy_sort_empty():
+    assert ranking.numpyNonDominatedSort([]) == ranking.pythonNonDominatedSort([]) == []
+
+
+def loopCrowdingDistance(front):
+    # The per front loop the batched version replaced, it sorts a copy of
+    # the front once per objective
+    front = list(front)
+    for individual in front:
+        individual.crowdingDistance = 0
+    for key in ranking.CROWDING_KEYS:
+        front.sort(key=lambda individual: individual.objectives[key])
+        front[0].crowdingDistance = 10**5
+        front[-1].crowdingDistance = 10**5
+        values = [individual.objectives[key] for individual in front]
+        scale = max(values) - min(values)
+        scale = scale if scale != 0 else 1
+        for i in range(1, len(front) - 1):
+            front[i].crowdingDistance += (front[i + 1].objectives[key] -
+                                          front[i - 1].objectives[key]) / scale
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('spread', [2, 6, 50])
+def test_batched_crowding_matches_loop(seed, spread):
+    rng = random.Random(seed)
+    individuals = randomIndividuals(rng, 60, spread)
+    for individual in individuals:
+        individual.objectives['center_of_mass'] += rng.choice([0, 0.5])
+    fronts = [[individuals[i] for i in front]
+              for front in ranking.numpyNonDominatedSort(individuals)]
+
+    for front in fronts:
+        loopCrowdingDistance(front)
+    expected = [individual.crowdingDistance for front in fronts for individual in front]
+
+    flat = [individual for front in fronts for individual in front]
+    frontIds = np.repeat(np.arange(len(fronts)), [len(front) for front in fronts])
+    distances = ranking.crowdingDistances(ranking.crowdingValues(flat), frontIds)
+    np.testing.assert_allclose(distances, expected)
@@ -0,0 +1,38 @@
+import json
+import stat
+import struct
+import numpy as np
+import pytest
+import results
+from transport import packArrays, unpackArrays, saveResult, PREFIX_LENGTH
+
+
+ARRAYS = {'codes': np.arange(5, dtype=np.int32), 'positions': np.arange(21.0).reshape(7, 3),
+          'flags': np.arange(3, dtype=np.uint8), 'objectives': np.ones(3)}
+
+
+@pytest.mark.parametrize('compress', [True, False])
+def test_arrays_round_trip(compress):
+    header, arrays = unpackArrays(packArrays({'individual': 'ab'}, ARRAYS, compress=compress))
+    assert header == {'individual': 'ab'}
+    for name, array in ARRAYS.items():
+        np.testing.assert_array_equal(arrays[name], array)
+        assert arrays[name].dtype == array.dtype
+
+
+def test_uncompressed_arrays_are_aligned_in_the_buffer():
+    data = packArrays({}, ARRAYS, compress=False)
+    headerLength = struct.unpack('<I', data[PREFIX_LENGTH:PREFIX_LENGTH + 4])[0]
+    start = PREFIX_LENGTH + 4 + headerLength
+    header = json.loads(data[PREFIX_LENGTH + 4:start])
+    assert [(start + spec['offset']) % 8 for spec in header['arrays']] == [0] * len(ARRAYS)
+
+
+def test_saved_results_get_the_umask_mode(tmp_path):
+    # Not mkstemp's 0600, static files must stay readable by other users
+    url = saveResult('ab', 'cd', b'data', directory=str(tmp_path))
+    path = tmp_path / 'results' / 'ab' / 'cd.bin'
+    assert url == '/static/results/ab/cd.bin'
+    assert path.read_bytes() == b'data'
+    assert stat.S_IMODE(path.stat().st_mode) == 0o666 & ~results.UMASK
+    assert [entry.name for entry in path.parent.iterdir()] == ['cd.bin']